@@ -0,0 +1,87 @@
+"""Latency/recall trade-off of downscaled face detection.
+
+Detections at full resolution are the reference; for every scale the
+benchmark reports mean detection time and the share of reference faces that
+were found again (IoU >= 0.5 after mapping boxes back). Run from the
+repository root::
+
+    python -m benchmarks.bench_detection data/known_faces --scales 1 0.75 0.5 0.33
+    python -m benchmarks.bench_detection recording.mp4 --frames 200 --model hog
+"""
+import argparse
+import os
+import time
+
+import cv2
+
+from face_recognition import face_utils
+from face_recognition.tracker import iou
+
+MIN_IOU = 0.5
+
+
+def load_frames(source, limit):
+    """Return up to ``limit`` RGB frames from an image directory or a video file."""
+    frames = []
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.lower().endswith(face_utils.IMAGE_EXTENSIONS):
+                img = cv2.imread(os.path.join(source, filename))
+                if img is not None:
+                    frames.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            if len(frames) >= limit:
+                break
+        return frames
+    cap = cv2.VideoCapture(source)
+    while len(frames) < limit:
+        ok, img = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def run(frames, scale, model):
+    """Return ``(locations per frame, mean seconds per frame)``."""
+    results = []
+    start = time.perf_counter()
+    for rgb in frames:
+        results.append(face_utils.detect_faces(rgb, scale=scale, model=model))
+    return results, (time.perf_counter() - start) / max(len(frames), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='image directory or video file')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.33, 0.25])
+    parser.add_argument('--model', default=face_utils.DETECTION_MODEL, choices=['hog', 'cnn'])
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        parser.error(f"no frames could be read from {args.source}")
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames, {width}x{height}, model={args.model}")
+
+    reference, ref_latency = run(frames, 1.0, args.model)
+    total = sum(len(r) for r in reference)
+    print(f"{'scale':>7}{'ms/frame':>11}{'speed-up':>10}{'recall':>9}{'faces':>7}")
+    for scale in args.scales:
+        found, latency = (reference, ref_latency) if scale >= 1.0 else run(frames, scale, args.model)
+        hits = sum(
+            1
+            for ref_boxes, boxes in zip(reference, found)
+            for ref in ref_boxes
+            if any(iou(ref, box) >= MIN_IOU for box in boxes)
+        )
+        recall = hits / total if total else 1.0
+        # A tiny input can time at 0; report no speed-up rather than divide by it.
+        speedup = ref_latency / latency if latency > 0 else float('nan')
+        print(f"{scale:>7.2f}{latency * 1000:>11.1f}{speedup:>10.2f}"
+              f"{recall:>9.3f}{sum(len(r) for r in found):>7}")
+
+
+if __name__ == '__main__':
+    main()
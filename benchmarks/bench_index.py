@@ -0,0 +1,77 @@
+"""Recall/latency benchmark of the IVF gallery index against exact search.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_index --size 20000 --probes 1 4 8 16
+    python -m benchmarks.bench_index --cache data/encodings_cache.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+from face_recognition.index import BruteForceIndex, IVFIndex
+from face_recognition.matcher import ENCODING_SIZE
+
+
+def synthetic_gallery(size, seed=0):
+    """Return encodings shaped roughly like dlib face descriptors."""
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0.0, 0.09, (size, ENCODING_SIZE)).astype(np.float32)
+    return matrix
+
+
+def cached_gallery(path):
+    with np.load(path, allow_pickle=False) as data:
+        return data['encodings'][data['has_face']].astype(np.float32)
+
+
+def make_queries(matrix, count, noise, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(matrix), min(count, len(matrix)), replace=False)
+    jitter = rng.normal(0.0, noise, (len(rows), matrix.shape[1])).astype(np.float32)
+    return matrix[rows] + jitter
+
+
+def time_search(index, queries):
+    """Return ``(top1, seconds per query)`` searching one face at a time."""
+    top1 = np.empty(len(queries), dtype=np.intp)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        idx, _ = index.search(queries[i:i + 1], k=2)
+        top1[i] = idx[0, 0]
+    return top1, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000, help='synthetic gallery size')
+    parser.add_argument('--cache', help='use encodings from an encoding cache file instead')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=0.02, help='per-dimension query noise')
+    parser.add_argument('--lists', type=int, default=None, help='IVF partitions (default sqrt(n))')
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    matrix = cached_gallery(args.cache) if args.cache else synthetic_gallery(args.size)
+    queries = make_queries(matrix, args.queries, args.noise)
+    print(f"gallery: {len(matrix)} encodings, queries: {len(queries)}")
+
+    exact = BruteForceIndex(matrix)
+    truth, exact_latency = time_search(exact, queries)
+    print(f"{'index':<14}{'recall@1':>10}{'ms/query':>12}{'speed-up':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_latency * 1000:>12.3f}{1.0:>10.2f}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(matrix, n_lists=args.lists)
+    print(f"ivf build: {time.perf_counter() - start:.2f}s, {len(ivf.centroids)} lists")
+    for probes in args.probes:
+        ivf.n_probe = probes
+        found, latency = time_search(ivf, queries)
+        recall = float(np.mean(found == truth))
+        print(f"{'ivf/' + str(probes):<14}{recall:>10.3f}{latency * 1000:>12.3f}"
+              f"{exact_latency / latency:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import sys
 import cv2
 import face_recognition
 import numpy as np
@@ -6,8 +7,37 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_socketio import SocketIO, emit
 import time
 import logging
+import threading
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
 
+# Make the repository's shared helpers importable without shadowing the
+# face_recognition library with the repository package of the same name.
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(REPO_DIR)
+from utils.encoding_cache import EncodingCache
+from utils.result_cache import ResultCache
+
+def _load_repo_package(name='attendance_faces'):
+    """
+    Imports the repository's face_recognition package under another name,
+    since 'face_recognition' here is the library.
+    """
+    if name not in sys.modules:
+        package_dir = os.path.join(REPO_DIR, 'face_recognition')
+        spec = importlib.util.spec_from_file_location(
+            name, os.path.join(package_dir, '__init__.py'), submodule_search_locations=[package_dir])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+_load_repo_package()
+from attendance_faces import face_utils
+from attendance_faces.matcher import FaceMatcher
+
 # Configure logging to console and file
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -22,6 +52,8 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Directories - Updated paths based on the new structure
 KNOWN_FACES_DIR = '../data/known_faces'
+ENCODING_CACHE_FILE = '../data/encodings_cache.npz'
+RESULT_CACHE_DIR = '../data/result_cache'
 UPLOADS_DIR = '../uploads' # Still useful for temporary storage if needed, but SocketIO handler saves directly
 PROCESSED_DIR = '../processed' # This directory might need to be reconsidered if processed images are served from frontend/public
 
@@ -30,15 +62,33 @@ os.makedirs(KNOWN_FACES_DIR, exist_ok=True)
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
+# Batch uploads: worker processes and how many images may wait in the pool.
+BATCH_WORKERS = os.cpu_count() or 1
+MAX_PENDING = 64
+batch_pool = None
+# Key of the known faces the batch workers were started with.
+batch_pool_key = None
+batch_pool_lock = threading.Lock()
+batch_slots = threading.BoundedSemaphore(MAX_PENDING)
+
 # Global variables to store known face encodings and names
 known_face_encodings = []
 known_face_names = []
+# Known faces as a FaceMatcher, rebuilt whenever they are loaded
+known_faces_matcher = FaceMatcher()
+# Identifies the loaded known faces; cached results computed against other
+# known faces are discarded.
+known_faces_key = known_faces_matcher.key
+
+# Results of images already processed, keyed by image content
+result_cache = ResultCache(directory=RESULT_CACHE_DIR)
 
 def load_known_faces():
     """
     Loads known faces and their encodings from the known_faces directory.
-    Each image filename should be the person's name (e.g., 'John_Doe.jpg').
-    Handles potential errors during image loading and encoding.
+    Each image filename is the person's name, optionally followed by _<number>
+    (e.g., 'John_Doe.jpg' or 'John_Doe_1717000000.jpg').
+    Photos without a face or that cannot be read are logged and skipped.
     """
     global known_face_encodings, known_face_names
     known_face_encodings = []
@@ -46,31 +96,32 @@ def load_known_faces():
     logging.info("Loading known faces...")
     if not os.path.exists(KNOWN_FACES_DIR):
         logging.warning(f"Known faces directory not found: {KNOWN_FACES_DIR}")
+        set_known_faces(known_face_encodings, known_face_names)
         return
 
-    for filename in os.listdir(KNOWN_FACES_DIR):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            name = os.path.splitext(filename)[0]
-            image_path = os.path.join(KNOWN_FACES_DIR, filename)
-            try:
-                logging.info(f"Attempting to load image: {image_path}")
-                image = face_recognition.load_image_file(image_path)
-                logging.info(f"Image loaded successfully: {image_path}")
-                encodings = face_recognition.face_encodings(image)
-                if encodings:
-                    known_face_encodings.append(encodings[0])
-                    known_face_names.append(name)
-                    logging.info(f"Loaded face encoding for: {name}")
-                else:
-                    logging.warning(f"No face found in {filename}. Skipping.")
-            except Exception as e:
-                logging.error(f"Error loading face from {filename}: {e}", exc_info=True)
+    # Photos are encoded by the repository's enrollment code, like in the
+    # other apps, so the shared encoding cache holds the same encoding for a
+    # photo whichever app encoded it first.
+    cache = EncodingCache(ENCODING_CACHE_FILE)
+    for image_path, name, encoding in face_utils.iter_known_faces(KNOWN_FACES_DIR, cache):
+        known_face_encodings.append(encoding)
+        known_face_names.append(name)
+        logging.info(f"Loaded face encoding for: {name} ({image_path})")
+    cache.prune(KNOWN_FACES_DIR, [os.path.join(KNOWN_FACES_DIR, f) for f in os.listdir(KNOWN_FACES_DIR)])
+    cache.save()
+    set_known_faces(known_face_encodings, known_face_names)
     logging.info(f"Finished loading {len(known_face_names)} known faces.")
     if not known_face_names:
         logging.warning("No known faces were loaded. All detected faces will be marked as 'Unknown'.")
 
-# Load known faces on startup
-load_known_faces()
+def set_known_faces(encodings, names):
+    """
+    Builds the matcher for a new set of known faces. Batch workers started
+    with the previous known faces are replaced on the next batch.
+    """
+    global known_faces_matcher, known_faces_key
+    known_faces_matcher = FaceMatcher.from_samples(encodings, names)
+    known_faces_key = known_faces_matcher.key
 
 @socketio.on('connect')
 def handle_connect():
@@ -82,11 +133,121 @@ def handle_disconnect():
     """Handles client disconnection."""
     logging.info('Client disconnected')
 
+def _init_batch_worker(matrix, names, tolerance):
+    """Process-pool initializer: give each worker the known faces' matcher."""
+    global known_faces_matcher, known_faces_key
+    known_faces_matcher = FaceMatcher(matrix, names, tolerance)
+    known_faces_key = known_faces_matcher.key
+
+def render_image_bytes(file_data, filename):
+    """
+    Decodes, recognizes and annotates one uploaded image.
+    Returns (locations, names, encoded processed image). Runs in the Socket.IO
+    handler for single uploads and in a pool worker for batches.
+    """
+    safe_filename = secure_filename(filename)
+    logging.info(f"Processing image: {safe_filename}")
+
+    image_np = np.frombuffer(file_data, np.uint8)
+    image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
+    if image is None:
+         logging.error(f"Could not decode image data for {safe_filename}. Invalid image format?")
+         raise ValueError("Could not decode image data.")
+
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    process_image = image.copy()
+
+    logging.info(f"Finding face locations and encodings in {safe_filename}...")
+    face_locations = face_recognition.face_locations(rgb_image)
+    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    logging.info(f"Found {len(face_locations)} face(s) in {safe_filename}.")
+
+    names = []
+    # All faces are matched against the known faces in one pass.
+    matches = known_faces_matcher.match(face_encodings)
+
+    for (top, right, bottom, left), match in zip(face_locations, matches):
+        name = match.name
+        color = (0, 0, 255) if name == "Unknown" else (0, 255, 0)
+        names.append(name)
+
+        cv2.rectangle(process_image, (left, top), (right, bottom), color, 2)
+
+        label_bottom = min(bottom, process_image.shape[0])
+        label_top = max(bottom - 35, 0)
+        cv2.rectangle(process_image, (left, label_top), (right, label_bottom), color, cv2.FILLED)
+        cv2.putText(process_image, name, (left + 6, label_bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
+
+    ok, output = cv2.imencode(os.path.splitext(safe_filename)[1] or '.jpg', process_image)
+    if not ok:
+        raise ValueError("Could not encode processed image.")
+    return face_locations, names, output.tobytes()
+
+def save_processed(filename, names, output):
+    """Writes a processed image and returns the 'image_processed' payload."""
+    processed_filename = f"processed_{secure_filename(filename)}"
+    processed_filepath = os.path.join(PROCESSED_DIR, processed_filename)
+    with open(processed_filepath, 'wb') as f:
+        f.write(output)
+    logging.info(f"Saved processed image: {processed_filepath}")
+
+    summary = [{"name": name, "timestamp": "N/A (Image)"} for name in names if name != "Unknown"]
+    # Processed images are served by the /processed/ route below.
+    return {'url': f"/processed/{processed_filename}", 'summary': summary, 'filename': filename}
+
+def process_image_bytes(file_data, filename):
+    """
+    Processes one uploaded image, answering repeated uploads of the same
+    photo from the result cache. Returns the 'image_processed' payload.
+    """
+    cached = result_cache.get(file_data, known_faces_key)
+    if cached is not None:
+        logging.info(f"Using cached result for: {filename}")
+        return save_processed(filename, cached.names, cached.output)
+    locations, names, output = render_image_bytes(file_data, filename)
+    result_cache.put(file_data, known_faces_key, locations, names, output)
+    return save_processed(filename, names, output)
+
+def get_batch_pool():
+    """
+    Returns (pool, key): the batch worker pool and the key of the known
+    faces its workers match against. The pool is created on first use and
+    replaced when the known faces change (jobs already queued on the old
+    pool finish there and their results are not cached) or after
+    reset_batch_pool dropped a broken one.
+    """
+    global batch_pool, batch_pool_key
+    with batch_pool_lock:
+        matcher = known_faces_matcher
+        if batch_pool is None or batch_pool_key != matcher.key:
+            if batch_pool is not None:
+                logging.info("Known faces changed; restarting batch workers")
+                batch_pool.shutdown(wait=False)
+            batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                             initializer=_init_batch_worker,
+                                             initargs=(matcher.matrix, matcher.names, matcher.tolerance))
+            batch_pool_key = matcher.key
+        return batch_pool, batch_pool_key
+
+def reset_batch_pool(pool, error):
+    """
+    Drops a broken batch pool (a worker process died, e.g. out of memory);
+    the next batch starts a new one.
+    """
+    global batch_pool
+    with batch_pool_lock:
+        if batch_pool is not pool:
+            # Already replaced.
+            return
+        batch_pool = None
+    logging.error(f"Batch workers failed ({error}); restarting them")
+    pool.shutdown(wait=False)
+
 @socketio.on('upload_image')
 def handle_image_upload(data):
     """
     Handles single image upload and processing via SocketIO.
-    This function will now be called for each image in the batch from the frontend.
+    Kept for older clients; the page uses 'upload_images' for batches.
     """
     logging.info("Received single image upload request via SocketIO")
     file_data = data.get('file')
@@ -97,85 +258,80 @@ def handle_image_upload(data):
         emit('error', {'message': 'Invalid file data received.'})
         return
 
-    safe_filename = secure_filename(filename)
-    temp_filepath = None
-
     try:
-        logging.info(f"Processing image: {safe_filename}")
-
-        image_np = np.frombuffer(file_data, np.uint8)
-        image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
-        if image is None:
-             logging.error(f"Could not decode image data for {safe_filename}. Invalid image format?")
-             raise ValueError("Could not decode image data.")
-
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        process_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
-
-        logging.info(f"Image loaded for processing: {safe_filename}")
-
-        logging.info(f"Finding face locations and encodings in {safe_filename}...")
-        face_locations = face_recognition.face_locations(rgb_image)
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-        logging.info(f"Found {len(face_locations)} face(s) in {safe_filename}.")
-
-        recognized_faces_summary = []
-
-        if face_locations:
-            for i in range(len(face_locations)):
-                top, right, bottom, left = face_locations[i]
-                face_encoding = face_encodings[i]
-
-                name = "Unknown"
-                color = (0, 0, 255)
-
-                if known_face_encodings:
-                    matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
-                    face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                    best_match_index = np.argmin(face_distances)
-
-                    if matches[best_match_index]:
-                        name = known_face_names[best_match_index]
-                        color = (0, 255, 0)
-                        recognized_faces_summary.append({"name": name, "timestamp": "N/A (Image)"})
-
-
-                cv2.rectangle(process_image, (left, top), (right, bottom), color, 2)
-
-                text_size = cv2.getTextSize(name, cv2.FONT_HERSHEY_DUPLEX, 1.0, 1)[0]
-                label_bottom = min(bottom, process_image.shape[0])
-                label_top = max(bottom - 35, 0)
-                cv2.rectangle(process_image, (left, label_top), (right, label_bottom), color, cv2.FILLED)
-                cv2.putText(process_image, name, (left + 6, label_bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
-        else:
-            logging.info(f"No faces detected in image: {safe_filename}")
-
-
-        processed_filename = f"processed_{safe_filename}"
-        processed_filepath = os.path.join(PROCESSED_DIR, processed_filename)
-        logging.info(f"Saving processed image to: {processed_filepath}")
-        cv2.imwrite(processed_filepath, process_image)
-        logging.info(f"Saved processed image: {processed_filepath}")
-
-        # Emit the processed image URL and summary (including the original filename)
-        # The URL needs to be relative to the frontend/public directory
-        # Assuming the Flask app serves from the root, and processed images are directly accessible
-        # from the root or a specific route. For the new structure, we'll serve from /processed/
-        processed_url = f"/processed/{processed_filename}"
-        logging.info(f"Emitting image_processed event for {safe_filename} with URL: {processed_url}")
-        emit('image_processed', {'url': processed_url, 'summary': recognized_faces_summary, 'filename': filename})
-        logging.info(f"Emitted image_processed event for {safe_filename}")
-
+        emit('image_processed', process_image_bytes(file_data, filename))
     except Exception as e:
-        logging.error(f"Error processing image {safe_filename}: {e}", exc_info=True)
+        logging.error(f"Error processing image {filename}: {e}", exc_info=True)
         emit('error', {'message': f'Error processing image {filename}: {e}'})
-    finally:
-         if temp_filepath and os.path.exists(temp_filepath):
-            try:
-                os.remove(temp_filepath)
-                logging.info(f"Cleaned up temporary uploaded file: {temp_filepath}")
-            except OSError as cleanup_error:
-                logging.error(f"Error cleaning up temporary uploaded file {temp_filepath}: {cleanup_error}", exc_info=True)
+
+@socketio.on('upload_images')
+def handle_batch_upload(data):
+    """
+    Handles a batch of images: {'images': [{'id', 'file', 'filename'}, ...]}.
+    Images are processed concurrently on the worker pool and an
+    'image_processed' (or 'image_failed') event carrying the image id is sent
+    as each one finishes, so results arrive out of order. At most
+    MAX_PENDING images are queued across all clients; the rest are reported
+    as rejected in 'batch_accepted' so the client can resend them later.
+    """
+    sid = request.sid
+    images = data.get('images') or []
+    accepted, rejected = [], []
+    pool, pool_key = get_batch_pool()
+
+    for item in images:
+        image_id = item.get('id')
+        file_data = item.get('file')
+        filename = item.get('filename')
+        if not file_data or not filename:
+            emit('image_failed', {'id': image_id, 'filename': filename, 'message': 'Invalid file data received.'})
+            continue
+        cached = result_cache.get(file_data, known_faces_key)
+        if cached is not None:
+            result = save_processed(filename, cached.names, cached.output)
+            result['id'] = image_id
+            emit('image_processed', result)
+            accepted.append(image_id)
+            continue
+        if not batch_slots.acquire(blocking=False):
+            rejected.append(image_id)
+            continue
+        try:
+            future = pool.submit(render_image_bytes, file_data, filename)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # The pool broke or was shut down; report this image and go on
+            # with a new pool.
+            batch_slots.release()
+            reset_batch_pool(pool, e)
+            emit('image_failed', {'id': image_id, 'filename': filename,
+                                  'message': f'Error processing image {filename}: {e}'})
+            pool, pool_key = get_batch_pool()
+            continue
+        future.add_done_callback(
+            lambda f, image_id=image_id, file_data=file_data, filename=filename, key=pool_key, pool=pool:
+            _on_batch_image_done(sid, image_id, file_data, filename, key, pool, f)
+        )
+        accepted.append(image_id)
+
+    logging.info(f"Batch upload: {len(accepted)} accepted, {len(rejected)} rejected (queue full)")
+    emit('batch_accepted', {'accepted': accepted, 'rejected': rejected})
+
+def _on_batch_image_done(sid, image_id, file_data, filename, key, pool, future):
+    """Caches and saves one batch result and sends it to the client that uploaded it."""
+    batch_slots.release()
+    try:
+        locations, names, output = future.result()
+        result_cache.put(file_data, key, locations, names, output)
+        result = save_processed(filename, names, output)
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            reset_batch_pool(pool, e)
+        logging.error(f"Error processing image {filename}: {e}")
+        socketio.emit('image_failed', {'id': image_id, 'filename': filename,
+                                       'message': f'Error processing image {filename}: {e}'}, to=sid)
+        return
+    result['id'] = image_id
+    socketio.emit('image_processed', result, to=sid)
 
 
 @app.route('/processed/<filename>')
@@ -206,5 +362,8 @@ def index():
     return send_from_directory('../frontend/public', 'Face_recognition_demo.html')
 
 if __name__ == '__main__':
+    # Loaded here rather than on import: pool workers re-import this module
+    # on platforms that spawn them, and get the known faces from the pool.
+    load_known_faces()
     logging.info("Starting Flask-SocketIO server on 127.0.0.1:5000")
     socketio.run(app, host='127.0.0.1', port=5000, debug=False, allow_unsafe_werkzeug=True)
@@ -0,0 +1,215 @@
+"""Take attendance from recorded video files and folders of images.
+
+Videos are split into frame ranges and images into single jobs that are
+decoded and recognized in parallel by a process pool. Results are consumed
+in order and logged exactly like the live system (deduplicated records and
+face snapshots, only within :func:`attendance.allowed_time`), using the
+time each frame was recorded. A frames/second
+summary is printed at the end, which also makes this a repeatable
+benchmark. Run from the repository root::
+
+    python -m face_recognition.batch cctv/entrance.mp4 --start 2026-10-16T07:30:00
+    python -m face_recognition.batch photos/ --workers 8 --dry-run
+"""
+import os
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+
+from utils import attendance
+from utils.dedup import AttendanceDeduper
+from utils.writer import AttendanceWriter
+from . import face_utils
+from .gallery import FaceGallery
+from .multicam import init_worker, pool_initargs, recognize_frame
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv')
+# Video frames handed to one worker job.
+CHUNK_FRAMES = 250
+# Analyse every n-th video frame; consecutive frames are nearly identical.
+FRAME_STEP = 5
+
+
+def _crops(frame, locations):
+    return [frame[top:bottom, left:right].copy() for top, right, bottom, left in locations]
+
+
+def process_video_chunk(path, start, stop, step, scale):
+    """Recognize frames ``start:stop:step`` of a video in a pool worker.
+
+    Returns ``(frames_decoded, results)`` with one ``(frame_no, names,
+    encodings, crops)`` entry per analysed frame that contains faces.
+    """
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    results = []
+    decoded = 0
+    try:
+        for frame_no in range(start, stop):
+            if (frame_no - start) % step:
+                # grab() advances without decoding the frame.
+                if not cap.grab():
+                    break
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            decoded += 1
+            locations, encodings, names = recognize_frame(frame, scale)
+            if locations:
+                results.append((frame_no, names, encodings, _crops(frame, locations)))
+    finally:
+        cap.release()
+    return decoded, results
+
+
+def process_image(path, scale):
+    """Recognize one image file in a pool worker; same return shape as videos."""
+    frame = cv2.imread(path)
+    if frame is None:
+        raise ValueError(f"Could not read image {path}")
+    locations, encodings, names = recognize_frame(frame, scale)
+    results = [(0, names, encodings, _crops(frame, locations))] if locations else []
+    return 1, results
+
+
+def collect_jobs(sources, step, start_time=None):
+    """Return ``(description, base_time, fps, function, args)`` jobs sorted by capture time.
+
+    Sources from different days or cameras may be given in any order; the
+    jobs are interleaved chronologically so detections reach the deduper
+    in the order they were recorded.
+    """
+    jobs = list(_iter_jobs(sources, step, start_time))
+    jobs.sort(key=_job_time)
+    return jobs
+
+
+def _job_time(job):
+    _, base, fps, _, args = job
+    # Video jobs start at frame args[1]; images are a single moment.
+    return base + timedelta(seconds=args[1] / fps) if fps else base
+
+
+def _iter_jobs(sources, step, start_time):
+    for source in sources:
+        if os.path.isdir(source):
+            for filename in sorted(os.listdir(source)):
+                path = os.path.join(source, filename)
+                if filename.lower().endswith(face_utils.IMAGE_EXTENSIONS):
+                    when = datetime.fromtimestamp(os.path.getmtime(path))
+                    yield path, when, None, process_image, (path,)
+                elif filename.lower().endswith(VIDEO_EXTENSIONS):
+                    yield from _video_jobs(path, step, start_time)
+        elif source.lower().endswith(face_utils.IMAGE_EXTENSIONS):
+            when = datetime.fromtimestamp(os.path.getmtime(source))
+            yield source, when, None, process_image, (source,)
+        else:
+            yield from _video_jobs(source, step, start_time)
+
+
+def _video_jobs(path, step, start_time):
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    cap.release()
+    if total <= 0:
+        logging.error("Could not read video %s", path)
+        return
+    # Without an explicit start, assume the recording ended at its mtime.
+    base = start_time or (datetime.fromtimestamp(os.path.getmtime(path))
+                          - timedelta(seconds=total / fps))
+    for start in range(0, total, CHUNK_FRAMES):
+        stop = min(start + CHUNK_FRAMES, total)
+        yield path, base, fps, process_video_chunk, (path, start, stop, step)
+
+
+def run(sources, gallery, workers=None, scale=None, step=FRAME_STEP, start_time=None,
+        deduper=None, writer=None):
+    """Process every source and return a summary dict."""
+    deduper = deduper or AttendanceDeduper()
+    workers = workers or os.cpu_count() or 1
+    summary = {'frames': 0, 'faces': 0, 'logged': 0, 'failed': 0}
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=pool_initargs(gallery.matcher)) as pool:
+        pending = deque()
+        jobs = collect_jobs(sources, step, start_time)
+
+        def consume(entry):
+            description, base, fps, future = entry
+            try:
+                decoded, results = future.result()
+            except Exception as e:
+                summary['failed'] += 1
+                logging.error("Could not process %s: %s", description, e)
+                return
+            summary['frames'] += decoded
+            for frame_no, names, encodings, crops in results:
+                when = base + timedelta(seconds=frame_no / fps) if fps else base
+                summary['faces'] += len(names)
+                if not attendance.allowed_time(when):
+                    continue
+                for name, encoding, crop in zip(names, encodings, crops):
+                    if not deduper.should_log(name, encoding, now=when.timestamp()):
+                        continue
+                    summary['logged'] += 1
+                    if writer is None:
+                        logging.info("%s %s (%s)", when.isoformat(), name, description)
+                        continue
+                    if name == 'Unknown':
+                        folder, status = attendance.UNKNOWN_DIR, 'Unknown - Logged'
+                    else:
+                        folder, status = attendance.SNAPSHOT_DIR, 'Present'
+                    writer.submit(name, crop, folder, status, when, block=True)
+
+        # Keep a bounded window of jobs in flight and consume them in
+        # capture order, so deduplication sees detections chronologically.
+        for description, base, fps, func, args in jobs:
+            pending.append((description, base, fps, pool.submit(func, *args, scale)))
+            if len(pending) >= workers * 2:
+                consume(pending.popleft())
+        while pending:
+            consume(pending.popleft())
+    if writer is not None:
+        writer.flush()
+    elapsed = time.monotonic() - started
+    summary['seconds'] = elapsed
+    summary['fps'] = summary['frames'] / elapsed if elapsed else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sources', nargs='+', help='video files, image files or folders')
+    parser.add_argument('--workers', type=int, default=None, help='recognition processes')
+    parser.add_argument('--scale', type=float, default=None, help='detection scale')
+    parser.add_argument('--step', type=int, default=FRAME_STEP, help='analyse every n-th video frame')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help='recording start time (ISO format) for video files')
+    parser.add_argument('--dry-run', action='store_true', help='print detections without logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    attendance.ensure_dirs()
+    gallery = FaceGallery(attendance.KNOWN_DIR)
+    gallery.load()
+    writer = None if args.dry_run else AttendanceWriter()
+    try:
+        summary = run(args.sources, gallery, args.workers, args.scale, max(args.step, 1),
+                      args.start, writer=writer)
+    finally:
+        if writer is not None:
+            writer.close()
+    print(f"frames: {summary['frames']}  faces: {summary['faces']}  logged: {summary['logged']}  "
+          f"failed jobs: {summary['failed']}")
+    print(f"time: {summary['seconds']:.1f}s  throughput: {summary['fps']:.1f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,109 @@
+import time
+import threading
+
 import cv2
 from . import face_utils
+from .matcher import FaceMatcher
+
+# Seconds to wait for a new frame before treating the camera as stopped.
+READ_TIMEOUT = 5.0
+
 
 class Camera:
-    """Simple camera capture class."""
-    def __init__(self, index=0):
+    """Simple camera capture class.
+
+    ``index`` is a device index, or a video file path / stream URL.
+
+    With ``threaded=True`` a background thread keeps draining the device and
+    only the newest frame is kept, so a slow consumer always gets a current
+    frame instead of one queued in OpenCV's buffer.
+    """
+    def __init__(self, index=0, threaded=False):
         self.index = index
+        self.threaded = threaded
         self.cap = None
+        self._cond = threading.Condition()
+        self._latest = None
+        self._returned_id = 0
+        self._grabber = None
+        self._running = False
 
     def start(self):
         if self.cap is None:
             self.cap = cv2.VideoCapture(self.index)
+            if self.threaded and self.cap.isOpened():
+                self._running = True
+                self._grabber = threading.Thread(target=self._grab_loop, name='camera-grabber', daemon=True)
+                self._grabber.start()
+
+    def is_opened(self):
+        if self.cap is None:
+            self.start()
+        return self.cap.isOpened()
+
+    def _grab_loop(self):
+        frame_id = 0
+        while self._running:
+            ret, frame = self.cap.read()
+            with self._cond:
+                if not ret:
+                    self._running = False
+                else:
+                    frame_id += 1
+                    self._latest = (frame_id, time.time(), frame)
+                self._cond.notify_all()
+
+    def read_latest(self, timeout=READ_TIMEOUT):
+        """Return ``(frame_id, capture_time, frame)`` for the newest unseen frame.
+
+        Returns None when the camera stopped or no new frame arrived within
+        ``timeout`` seconds. Only available with ``threaded=True``.
+        """
+        if self.cap is None:
+            self.start()
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: not self._running
+                or (self._latest is not None and self._latest[0] != self._returned_id),
+                timeout,
+            )
+            if not ready or self._latest is None or self._latest[0] == self._returned_id:
+                return None
+            self._returned_id = self._latest[0]
+            return self._latest
 
     def read_frame(self):
         if self.cap is None:
             self.start()
         if not self.cap.isOpened():
             return None
+        if self.threaded:
+            latest = self.read_latest()
+            return latest[2] if latest else None
         ret, frame = self.cap.read()
         if not ret:
             return None
         return frame
 
     def release(self):
+        if self._grabber:
+            self._running = False
+            self._grabber.join()
+            self._grabber = None
         if self.cap:
             self.cap.release()
             self.cap = None
+        self._latest = None
+        self._returned_id = 0
 
     def generate_frames(self, known_face_encodings, known_face_names):
         """Generator that yields processed frames for streaming."""
+        matcher = FaceMatcher.from_samples(known_face_encodings, known_face_names)
         while True:
             frame = self.read_frame()
             if frame is None:
                 break
-            locations, names = face_utils.recognize_faces(
-                frame, known_face_encodings, known_face_names
-            )
+            locations, names = face_utils.recognize_faces(frame, matcher=matcher)
             frame = face_utils.draw_overlays(frame, locations, names)
             ret, buffer = cv2.imencode('.jpg', frame)
             if not ret:
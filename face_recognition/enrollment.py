@@ -0,0 +1,136 @@
+"""Encode known-face photos in parallel, reporting unusable images.
+
+Each photo is decoded, shrunk when it is very large, searched for faces and
+encoded in a process pool, so enrolling a whole school scales with the
+number of cores. Photos without a face are reported and skipped; photos
+with several faces are reported and enrolled with the largest one. The
+encoding cache is updated, so the applications start without re-encoding.
+Run from the repository root::
+
+    python -m face_recognition.enrollment data/known_faces --workers 8
+"""
+import os
+import time
+import logging
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import face_recognition
+
+from utils.encoding_cache import EncodingCache
+from . import face_utils
+
+# Photos whose longer side exceeds this are shrunk before detection; a
+# portrait needs far fewer pixels than a modern camera produces.
+MAX_SIDE = 1600
+# Below this many images the pool start-up costs more than it saves.
+MIN_PARALLEL = 8
+
+OK = 'ok'
+NO_FACE = 'no face'
+MULTIPLE_FACES = 'multiple faces'
+ERROR = 'error'
+
+# ``encoding`` is None unless a face was found; ``faces`` is the number of
+# faces detected and ``message`` explains an ERROR.
+EnrollmentResult = namedtuple('EnrollmentResult', ['path', 'status', 'encoding', 'faces', 'message'])
+
+
+def encode_file(path, max_side=MAX_SIDE, model=face_utils.DETECTION_MODEL):
+    """Encode one photo; runs in a pool worker and never raises."""
+    try:
+        image = face_recognition.load_image_file(path)
+        height, width = image.shape[:2]
+        if max_side and max(height, width) > max_side:
+            factor = max_side / max(height, width)
+            image = cv2.resize(image, (round(width * factor), round(height * factor)),
+                               interpolation=cv2.INTER_AREA)
+        locations = face_recognition.face_locations(image, face_utils.DETECTION_UPSAMPLE, model)
+        if not locations:
+            return EnrollmentResult(path, NO_FACE, None, 0, '')
+        largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+        encoding = face_recognition.face_encodings(image, [largest])[0]
+        status = OK if len(locations) == 1 else MULTIPLE_FACES
+        return EnrollmentResult(path, status, encoding, len(locations), '')
+    except Exception as e:
+        return EnrollmentResult(path, ERROR, None, 0, str(e))
+
+
+def encode_images(paths, workers=None, max_side=MAX_SIDE, progress=None):
+    """Encode photos on a process pool; return results in the order of ``paths``.
+
+    ``progress(done, total, result)`` is called as each photo finishes.
+    Unusable photos are logged as warnings.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    results = {}
+
+    def finished(result):
+        results[result.path] = result
+        if result.status == ERROR:
+            logging.error("Could not encode %s: %s", result.path, result.message)
+        elif result.status != OK:
+            logging.warning("%s: %s", result.path, result.status)
+        if progress:
+            progress(len(results), len(paths), result)
+
+    if workers == 1 or len(paths) < MIN_PARALLEL:
+        for path in paths:
+            finished(encode_file(path, max_side))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            futures = [pool.submit(encode_file, path, max_side) for path in paths]
+            for future in as_completed(futures):
+                finished(future.result())
+    return [results[path] for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', nargs='?', default=face_utils.KNOWN_FACES_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='encoding processes')
+    parser.add_argument('--max-side', type=int, default=MAX_SIDE,
+                        help='shrink photos larger than this many pixels (0 keeps full size)')
+    parser.add_argument('--no-cache', action='store_true', help='re-encode every photo')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    cache = EncodingCache(face_utils.ENCODING_CACHE_FILE)
+    paths = [os.path.join(args.directory, f) for f in sorted(os.listdir(args.directory))
+             if f.lower().endswith(face_utils.IMAGE_EXTENSIONS)]
+    if not args.no_cache:
+        paths = [path for path in paths if not cache.lookup(path)[0]]
+
+    step = max(len(paths) // 20, 1)
+
+    def report(done, total, result):
+        if done % step == 0 or done == total:
+            print(f"\r{done}/{total} photos encoded", end='', flush=True)
+
+    started = time.monotonic()
+    results = encode_images(paths, args.workers, args.max_side, progress=report)
+    elapsed = time.monotonic() - started
+    if paths:
+        print()
+    for result in results:
+        if result.status != ERROR:
+            cache.store(result.path, result.encoding)
+    cache.prune(args.directory, [os.path.join(args.directory, f) for f in os.listdir(args.directory)])
+    cache.save()
+
+    problems = [r for r in results if r.status != OK]
+    for result in problems:
+        detail = result.message or (f"{result.faces} faces" if result.faces > 1 else '')
+        print(f"{result.status:15} {os.path.basename(result.path)}  {detail}")
+    enrolled = sum(1 for r in results if r.encoding is not None)
+    print(f"encoded: {len(results)}  enrolled: {enrolled}  problems: {len(problems)}  "
+          f"time: {elapsed:.1f}s  ({len(results) / elapsed if elapsed else 0.0:.1f} photos/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,49 +4,135 @@ import numpy as np
 import face_recognition
 import logging
 
+from utils.photos import person_name
+from utils.encoding_cache import EncodingCache
+from .matcher import FaceMatcher
+
 KNOWN_FACES_DIR = os.path.join('data', 'known_faces')
 PROCESSED_DIR = os.path.join('data', 'processed')
+ENCODING_CACHE_FILE = os.path.join('data', 'encodings_cache.npz')
+INDEX_FILE = os.path.join('data', 'gallery_index.npz')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Face detection runs on a copy of the frame shrunk to at most this width
+# (or by an explicit ``scale``); boxes are mapped back to full resolution
+# for encoding and drawing. Smaller is faster but misses small faces.
+DETECTION_MAX_WIDTH = 640
+# 'hog' runs on the CPU; 'cnn' is more accurate but needs a GPU to be usable.
+DETECTION_MODEL = 'hog'
+DETECTION_UPSAMPLE = 1
+
+
+def iter_known_faces(directory, cache=None, workers=None, progress=None):
+    """Yield ``(path, name, encoding)`` for every image with a face in ``directory``.
+
+    ``name`` is the person (see :func:`utils.photos.person_name`), so a
+    person with several photos yields several samples.
+
+    Unchanged images are read from ``cache`` (an :class:`EncodingCache`);
+    new or modified images are encoded in parallel (see
+    :func:`enrollment.encode_images`) and stored in it.
+    """
+    from .enrollment import ERROR, encode_images
 
+    encodings = {}
+    missing = []
+    paths = [os.path.join(directory, f) for f in sorted(os.listdir(directory))
+             if f.lower().endswith(IMAGE_EXTENSIONS)]
+    for path in paths:
+        try:
+            hit, encoding = cache.lookup(path) if cache else (False, None)
+        except OSError as e:
+            logging.error("Error loading %s: %s", path, e)
+            continue
+        if hit:
+            encodings[path] = encoding
+        else:
+            missing.append(path)
+    for result in encode_images(missing, workers, progress=progress):
+        if result.status == ERROR:
+            continue
+        encodings[result.path] = result.encoding
+        if cache:
+            cache.store(result.path, result.encoding)
+    for path in paths:
+        if encodings.get(path) is not None:
+            yield path, person_name(path), encodings[path]
 
-def load_known_faces(directory=KNOWN_FACES_DIR):
-    """Load and encode faces from a directory."""
+
+def load_known_faces(directory=KNOWN_FACES_DIR, cache_file=ENCODING_CACHE_FILE, workers=None):
+    """Load and encode faces from a directory.
+
+    Unchanged images are read from the encoding cache at ``cache_file``; only
+    new or modified images are encoded, using ``workers`` processes. Pass
+    ``cache_file=None`` to disable the cache.
+    """
     encodings = []
     names = []
     if not os.path.exists(directory):
         logging.warning("Known faces directory not found: %s", directory)
         return encodings, names
-    for filename in os.listdir(directory):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            path = os.path.join(directory, filename)
-            name = os.path.splitext(filename)[0]
-            try:
-                image = face_recognition.load_image_file(path)
-                faces = face_recognition.face_encodings(image)
-                if faces:
-                    encodings.append(faces[0])
-                    names.append(name)
-            except Exception as e:
-                logging.error("Error loading %s: %s", filename, e)
+    cache = EncodingCache(cache_file) if cache_file else None
+    for _, name, encoding in iter_known_faces(directory, cache, workers):
+        encodings.append(encoding)
+        names.append(name)
+    if cache:
+        cache.prune(directory, [os.path.join(directory, f) for f in os.listdir(directory)])
+        cache.save()
     return encodings, names
 
 
-def recognize_faces(image, known_encodings, known_names):
-    """Detect and recognize faces in a BGR image."""
+def detection_scale(width, max_width=DETECTION_MAX_WIDTH):
+    """Return the resize factor that brings ``width`` down to ``max_width``."""
+    if not max_width or width <= max_width:
+        return 1.0
+    return max_width / float(width)
+
+
+def detect_faces(rgb, scale=None, model=DETECTION_MODEL, upsample=DETECTION_UPSAMPLE):
+    """Return face locations in ``rgb`` coordinates, detecting on a resized copy.
+
+    ``scale`` defaults to :func:`detection_scale` of the frame width.
+    """
+    height, width = rgb.shape[:2]
+    if scale is None:
+        scale = detection_scale(width)
+    if scale >= 1.0:
+        return face_recognition.face_locations(rgb, upsample, model)
+    small = cv2.resize(rgb, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    locations = []
+    for top, right, bottom, left in face_recognition.face_locations(small, upsample, model):
+        locations.append((
+            max(int(round(top / scale)), 0),
+            min(int(round(right / scale)), width),
+            min(int(round(bottom / scale)), height),
+            max(int(round(left / scale)), 0),
+        ))
+    return locations
+
+
+def detect_and_match(image, matcher, scale=None, model=DETECTION_MODEL):
+    """Detect faces in a BGR image and match them against a :class:`FaceMatcher`.
+
+    Returns ``(locations, encodings, matches)`` with locations in the
+    coordinates of ``image``.
+    """
     rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    locations = face_recognition.face_locations(rgb)
+    locations = detect_faces(rgb, scale, model)
     encodings = face_recognition.face_encodings(rgb, locations)
-    names = []
-    for encoding in encodings:
-        name = "Unknown"
-        if known_encodings:
-            matches = face_recognition.compare_faces(known_encodings, encoding)
-            distances = face_recognition.face_distance(known_encodings, encoding)
-            if len(distances) > 0:
-                best = int(np.argmin(distances))
-                if matches[best]:
-                    name = known_names[best]
-        names.append(name)
-    return locations, names
+    return locations, encodings, matcher.match(encodings)
+
+
+def recognize_faces(image, known_encodings=None, known_names=None, matcher=None, scale=None):
+    """Detect and recognize faces in a BGR image.
+
+    Pass a prebuilt ``matcher`` to avoid stacking the known encodings on
+    every call, and ``scale=1.0`` to detect at full resolution.
+    """
+    if matcher is None:
+        matcher = FaceMatcher.from_samples(known_encodings, known_names)
+    locations, _, matches = detect_and_match(image, matcher, scale)
+    return locations, [m.name for m in matches]
 
 
 def draw_overlays(image, face_locations, face_names):
@@ -69,21 +155,40 @@ def draw_overlays(image, face_locations, face_names):
     return image
 
 
-def process_uploaded_image(file_data, filename, known_encodings, known_names):
-    """Process uploaded image bytes and save processed result."""
-    np_data = np.frombuffer(file_data, np.uint8)
-    img = cv2.imdecode(np_data, cv2.IMREAD_COLOR)
-    if img is None:
-        raise ValueError("Could not decode image data")
-
-    locations, names = recognize_faces(img, known_encodings, known_names)
-    processed = draw_overlays(img.copy(), locations, names)
+def process_uploaded_image(file_data, filename, known_encodings=None, known_names=None, matcher=None,
+                           cache=None):
+    """Process uploaded image bytes and save processed result.
 
+    With a :class:`utils.result_cache.ResultCache`, an image already
+    processed against the same gallery is answered from the cache.
+    """
+    if matcher is None:
+        matcher = FaceMatcher.from_samples(known_encodings, known_names)
     os.makedirs(PROCESSED_DIR, exist_ok=True)
     out_name = f"processed_{filename}"
     out_path = os.path.join(PROCESSED_DIR, out_name)
-    cv2.imwrite(out_path, processed)
+
+    cached = cache.get(file_data, matcher.key) if cache is not None else None
+    if cached is not None:
+        names = cached.names
+        with open(out_path, 'wb') as f:
+            f.write(cached.output)
+    else:
+        np_data = np.frombuffer(file_data, np.uint8)
+        img = cv2.imdecode(np_data, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode image data")
+
+        # Uploaded photos are often group shots with small faces; keep full resolution.
+        locations, names = recognize_faces(img, matcher=matcher, scale=1.0)
+        processed = draw_overlays(img.copy(), locations, names)
+        ok, output = cv2.imencode(os.path.splitext(out_name)[1] or '.jpg', processed)
+        if not ok:
+            raise ValueError(f"Could not encode processed image {out_name}")
+        with open(out_path, 'wb') as f:
+            f.write(output.tobytes())
+        if cache is not None:
+            cache.put(file_data, matcher.key, locations, names, output.tobytes())
 
     summary = [{"name": n} for n in names]
     return out_name, summary
-
@@ -0,0 +1,161 @@
+import os
+import logging
+import threading
+
+from utils.photos import person_name
+from utils.encoding_cache import EncodingCache
+from . import enrollment, face_utils
+from .index import IVFIndex, build_index, fingerprint
+from .matcher import FaceMatcher, build_templates
+
+
+class FaceGallery:
+    """In-memory set of known faces that can be updated one image at a time.
+
+    Writers are serialised by a lock and publish a new :class:`FaceMatcher`
+    when they finish; readers take :attr:`matcher` once per frame and keep
+    using it, so a frame is never matched against a half-updated gallery.
+    The ``*_images`` methods apply many changes with a single update and a
+    single save of the encoding cache.
+
+    Photos of the same person are collapsed into a few template rows (see
+    :func:`matcher.build_templates`) before the matcher is built.
+
+    ``index`` selects the search structure behind the matcher (see
+    :data:`index.INDEX_TYPES`). An IVF index is persisted to ``index_file``
+    and reused on the next start when the gallery is unchanged.
+    """
+
+    def __init__(self, directory=face_utils.KNOWN_FACES_DIR,
+                 cache_file=face_utils.ENCODING_CACHE_FILE,
+                 index='exact', index_file=None):
+        self.directory = directory
+        self.index_kind = index
+        self.index_file = index_file
+        self.cache = EncodingCache(cache_file) if cache_file else None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved_index = None
+        self._entries = {}
+        self._matcher = FaceMatcher()
+        self.version = 0
+
+    def load(self):
+        """(Re)load every image in the directory, using the encoding cache."""
+        with self._lock:
+            self._entries = {}
+            if not os.path.exists(self.directory):
+                logging.warning("Known faces directory not found: %s", self.directory)
+            else:
+                for path, name, encoding in face_utils.iter_known_faces(self.directory, self.cache):
+                    self._entries[path] = (name, encoding)
+                if self.cache:
+                    listed = [os.path.join(self.directory, f) for f in os.listdir(self.directory)]
+                    self.cache.prune(self.directory, listed)
+            self._publish(reuse_saved=True)
+        self._save()
+
+    @property
+    def matcher(self):
+        """The current :class:`FaceMatcher`; replaced, never mutated."""
+        return self._matcher
+
+    @property
+    def names(self):
+        return self._matcher.names
+
+    def add_image(self, path):
+        """Encode a single image and add it; return False if it has no face."""
+        return bool(self.add_images([path]))
+
+    def add_images(self, paths):
+        """Encode images and add them in one update; return the paths with a face.
+
+        Images are encoded by :func:`enrollment.encode_images`, like a bulk
+        load, so a photo gets the same encoding however it was enrolled.
+        """
+        if not paths:
+            return []
+        results = enrollment.encode_images(paths)
+        with self._lock:
+            for result in results:
+                if result.status == enrollment.ERROR:
+                    continue
+                if self.cache:
+                    self.cache.store(result.path, result.encoding)
+                if result.encoding is None:
+                    self._entries.pop(result.path, None)
+                else:
+                    self._entries[result.path] = (self._name_for(result.path), result.encoding)
+            self._publish()
+        self._save()
+        return [r.path for r in results if r.encoding is not None]
+
+    def remove_image(self, path):
+        self.remove_images([path])
+
+    def remove_images(self, paths):
+        with self._lock:
+            removed = False
+            for path in paths:
+                if self.cache:
+                    self.cache.discard(path)
+                removed = self._entries.pop(path, None) is not None or removed
+            if removed:
+                self._publish()
+        self._save()
+
+    def rename_image(self, old_path, new_path):
+        """Move an entry to a renamed file without re-encoding it."""
+        self.rename_images([(old_path, new_path)])
+
+    def rename_images(self, renames):
+        """Apply ``(old_path, new_path)`` renames in one update, without re-encoding."""
+        with self._lock:
+            for old_path, new_path in renames:
+                entry = self._entries.pop(old_path, None)
+                if self.cache:
+                    self.cache.discard(old_path)
+                if entry is None:
+                    continue
+                self._entries[new_path] = (self._name_for(new_path), entry[1])
+                if self.cache:
+                    self.cache.store(new_path, entry[1])
+            self._publish()
+        self._save()
+
+    @staticmethod
+    def _name_for(path):
+        return person_name(path)
+
+    def _publish(self, reuse_saved=False):
+        # Called with the lock held. Files are written later by _save.
+        entries = list(self._entries.values())
+        matrix, names = build_templates([e[1] for e in entries], [e[0] for e in entries])
+        index = None
+        persist = self.index_file and self.index_kind == IVFIndex.kind
+        if persist and reuse_saved:
+            index = IVFIndex.load(self.index_file, matrix)
+        if index is None:
+            index = build_index(self.index_kind, matrix, previous=self._matcher.index)
+            if persist:
+                self._unsaved_index = (index, fingerprint(matrix))
+        self._matcher = FaceMatcher(matrix, names, index=index)
+        self.version += 1
+
+    def _save(self):
+        # Writes the encoding cache and the IVF index outside the gallery
+        # lock, so matching and further updates are not held up by file I/O.
+        # Only the latest index and cache contents are written.
+        with self._save_lock:
+            with self._lock:
+                unsaved_index, self._unsaved_index = self._unsaved_index, None
+                entries = self.cache.snapshot() if self.cache and self.cache.dirty else None
+            if unsaved_index is not None:
+                index, digest = unsaved_index
+                try:
+                    index.save(self.index_file, digest)
+                except OSError as e:
+                    logging.error("Could not write index %s: %s", self.index_file, e)
+            if entries is not None:
+                self.cache.save(entries)
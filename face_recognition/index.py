@@ -0,0 +1,212 @@
+import os
+import hashlib
+import logging
+
+import numpy as np
+
+DEFAULT_PROBES = 8
+KMEANS_ITERATIONS = 10
+# Below this many rows an IVF index degenerates to a single list, because a
+# brute-force scan is already cheaper than probing centroids.
+MIN_IVF_ROWS = 1024
+ASSIGN_CHUNK = 8192
+
+
+def squared_distances(queries, matrix, sq_norms=None):
+    """Return the ``(len(queries), len(matrix))`` matrix of squared distances."""
+    if sq_norms is None:
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+    sq = (np.einsum('ij,ij->i', queries, queries)[:, None]
+          + sq_norms[None, :]
+          - 2.0 * (queries @ matrix.T))
+    return np.maximum(sq, 0.0, out=sq)
+
+
+def _top_k(sq, k):
+    """Return ``(indices, distances)`` of the ``k`` smallest entries per row."""
+    k_eff = min(k, sq.shape[1])
+    if k_eff < sq.shape[1]:
+        part = np.argpartition(sq, k_eff - 1, axis=1)[:, :k_eff]
+    else:
+        part = np.tile(np.arange(sq.shape[1]), (sq.shape[0], 1))
+    part_sq = np.take_along_axis(sq, part, axis=1)
+    order = np.argsort(part_sq, axis=1)
+    idx = np.take_along_axis(part, order, axis=1)
+    dist = np.sqrt(np.take_along_axis(part_sq, order, axis=1))
+    if k_eff < k:
+        pad = k - k_eff
+        idx = np.pad(idx, ((0, 0), (0, pad)), constant_values=-1)
+        dist = np.pad(dist, ((0, 0), (0, pad)), constant_values=np.inf)
+    return idx, dist.astype(np.float32)
+
+
+def fingerprint(matrix):
+    """Return a short digest identifying the rows an index was built from."""
+    return hashlib.sha1(np.ascontiguousarray(matrix).tobytes()).hexdigest()
+
+
+class BruteForceIndex:
+    """Exact nearest-neighbour search over every gallery row."""
+
+    kind = 'exact'
+
+    def __init__(self, matrix, **_):
+        self.matrix = matrix
+        self.sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+    def search(self, queries, k=2):
+        """Return ``(indices, distances)``, each of shape ``(len(queries), k)``.
+
+        Missing neighbours are padded with index -1 and distance ``inf``.
+        """
+        if len(self.matrix) == 0:
+            return (np.full((len(queries), k), -1, dtype=np.intp),
+                    np.full((len(queries), k), np.inf, dtype=np.float32))
+        return _top_k(squared_distances(queries, self.matrix, self.sq_norms), k)
+
+
+class IVFIndex:
+    """Inverted-file index: k-means partitions scanned only near the query.
+
+    A query is compared with the partition centroids and only the rows of the
+    ``n_probe`` closest partitions are scanned exactly, so search cost grows
+    with roughly ``sqrt(n)`` instead of ``n``. ``centroids`` from a previous
+    index can be reused to skip k-means when the gallery changes slightly;
+    ``trained_rows`` is the gallery size they were trained on (see
+    :func:`build_index`).
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, matrix, n_lists=None, n_probe=DEFAULT_PROBES, centroids=None, seed=0,
+                 trained_rows=None):
+        self.matrix = matrix
+        self.sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        self.n_probe = n_probe
+        if centroids is None:
+            if n_lists is None:
+                n_lists = 1 if len(matrix) < MIN_IVF_ROWS else int(np.sqrt(len(matrix)))
+            centroids = self._train(matrix, n_lists, seed)
+            trained_rows = len(matrix)
+        self.trained_rows = len(matrix) if trained_rows is None else int(trained_rows)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._build_lists(self._assign(matrix, self.centroids))
+
+    @staticmethod
+    def _assign(matrix, centroids):
+        labels = np.empty(len(matrix), dtype=np.intp)
+        for start in range(0, len(matrix), ASSIGN_CHUNK):
+            chunk = matrix[start:start + ASSIGN_CHUNK]
+            labels[start:start + len(chunk)] = np.argmin(squared_distances(chunk, centroids), axis=1)
+        return labels
+
+    @classmethod
+    def _train(cls, matrix, n_lists, seed):
+        n_lists = max(1, min(n_lists, len(matrix)))
+        if len(matrix) == 0:
+            return np.zeros((1, matrix.shape[1]), dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(len(matrix), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = cls._assign(matrix, centroids)
+            order = np.argsort(labels, kind='stable')
+            counts = np.bincount(labels, minlength=n_lists)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            sums = np.add.reduceat(matrix[order], starts[filled], axis=0)
+            centroids[filled] = sums / counts[filled, None]
+        return centroids
+
+    def _build_lists(self, labels):
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=len(self.centroids))
+        self.ids = order.astype(np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
+
+    def search(self, queries, k=2):
+        """Return ``(indices, distances)`` like :meth:`BruteForceIndex.search`."""
+        out_idx = np.full((len(queries), k), -1, dtype=np.intp)
+        out_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if len(self.matrix) == 0 or len(queries) == 0:
+            return out_idx, out_dist
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe_sq = squared_distances(queries, self.centroids)
+        probes = np.argpartition(probe_sq, n_probe - 1, axis=1)[:, :n_probe]
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate(
+                [self.ids[self.offsets[l]:self.offsets[l + 1]] for l in lists]
+            )
+            if len(candidates) == 0:
+                continue
+            sq = squared_distances(queries[q:q + 1], self.matrix[candidates],
+                                   self.sq_norms[candidates])
+            idx, dist = _top_k(sq, k)
+            found = idx[0] >= 0
+            out_idx[q, found] = candidates[idx[0][found]]
+            out_dist[q] = dist[0]
+        return out_idx, out_dist
+
+    def save(self, path, fingerprint_value=None):
+        """Persist the index next to the digest of the rows it was built from."""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                ids=self.ids,
+                offsets=self.offsets,
+                n_probe=np.array(self.n_probe),
+                trained_rows=np.array(self.trained_rows),
+                fingerprint=np.array(fingerprint_value or fingerprint(self.matrix)),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, matrix):
+        """Load a saved index for ``matrix``; return None if missing or stale."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['fingerprint']) != fingerprint(matrix):
+                    return None
+                if 'trained_rows' not in data.files:
+                    # Saved before the training size was recorded; retrain.
+                    return None
+                index = cls.__new__(cls)
+                index.matrix = matrix
+                index.sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+                index.n_probe = int(data['n_probe'])
+                index.trained_rows = int(data['trained_rows'])
+                index.centroids = data['centroids']
+                index.ids = data['ids']
+                index.offsets = data['offsets']
+                return index
+        except Exception as e:
+            logging.warning("Ignoring unreadable index %s: %s", path, e)
+            return None
+
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def build_index(kind, matrix, previous=None, **options):
+    """Build an index of the given kind, reusing ``previous`` training if possible."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {kind}")
+    if kind == IVFIndex.kind and isinstance(previous, IVFIndex) and 'centroids' not in options:
+        # Reuse the partitioning while the gallery stays within a factor of two
+        # of the size it was trained on; comparing with the previous size
+        # instead would let many small updates keep the centroids forever.
+        trained = previous.trained_rows
+        if trained // 2 <= len(matrix) <= trained * 2:
+            options['centroids'] = previous.centroids
+            options['trained_rows'] = trained
+            options.setdefault('n_probe', previous.n_probe)
+    return INDEX_TYPES[kind](matrix, **options)
@@ -0,0 +1,161 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from .index import build_index, squared_distances
+
+ENCODING_SIZE = 128
+DEFAULT_TOLERANCE = 0.6
+UNKNOWN = 'Unknown'
+# Template rows kept per person, their centroid included.
+MAX_SAMPLES = 4
+# Samples this far from the centroid of a person's photos are treated as
+# mislabelled or unusable when the person has at least three photos.
+OUTLIER_DISTANCE = 0.6
+
+# ``margin`` is the gap between the best distance and the best distance to a
+# different person; it is ``inf`` when there is no other person to compare
+# with (a gallery of one person, or an empty one), so a margin threshold
+# never rejects a match for lack of a competitor;
+# ``index`` is the matched gallery row, or -1 when the gallery is empty.
+Match = namedtuple('Match', ['name', 'distance', 'margin', 'index'])
+
+
+def as_matrix(encodings):
+    """Stack encodings into a contiguous ``(n, 128)`` float32 matrix."""
+    if encodings is None or len(encodings) == 0:
+        return np.zeros((0, ENCODING_SIZE), dtype=np.float32)
+    return np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+
+
+def gallery_key(encodings, names, tolerance=None):
+    """Return a digest identifying a set of known faces.
+
+    It is derived from the gallery contents rather than a counter, so results
+    cached on disk stay valid across restarts while the gallery is unchanged.
+    """
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(np.asarray(encodings, dtype=np.float32)).tobytes())
+    digest.update('\0'.join(names).encode('utf-8'))
+    digest.update(repr(tolerance).encode('ascii'))
+    return digest.hexdigest()
+
+
+def _representatives(samples, centroid, count):
+    # Farthest-point sampling: each pick is the sample least covered by the
+    # centroid and the samples picked so far, so the picks span the poses.
+    if len(samples) <= count:
+        return list(range(len(samples)))
+    covered = np.linalg.norm(samples - centroid, axis=1)
+    chosen = []
+    for _ in range(count):
+        i = int(np.argmax(covered))
+        chosen.append(i)
+        covered = np.minimum(covered, np.linalg.norm(samples - samples[i], axis=1))
+    return chosen
+
+
+def build_templates(encodings, names, max_samples=MAX_SAMPLES):
+    """Collapse per-photo encodings into a few template rows per person.
+
+    Each person gets at most ``max_samples`` rows: their samples as they are
+    when there are that few, otherwise the centroid of the samples plus
+    ``max_samples - 1`` representative samples, so the gallery grows with
+    people rather than photos. Returns ``(matrix, names)`` with one name per
+    row.
+    """
+    matrix = as_matrix(encodings)
+    groups = {}
+    for row, name in enumerate(names or []):
+        groups.setdefault(name, []).append(row)
+    blocks = []
+    template_names = []
+    for name, rows in groups.items():
+        samples = matrix[rows]
+        if len(samples) > 1:
+            centroid = samples.mean(axis=0, keepdims=True)
+            if len(samples) >= 3:
+                inliers = np.linalg.norm(samples - centroid, axis=1) <= OUTLIER_DISTANCE
+                if inliers.any() and not inliers.all():
+                    samples = samples[inliers]
+                    centroid = samples.mean(axis=0, keepdims=True)
+            if len(samples) > max_samples:
+                chosen = _representatives(samples, centroid, max_samples - 1)
+                samples = np.vstack([centroid, samples[chosen]])
+        blocks.append(samples)
+        template_names.extend([name] * len(samples))
+    if not blocks:
+        return as_matrix(None), []
+    return np.ascontiguousarray(np.vstack(blocks), dtype=np.float32), template_names
+
+
+class FaceMatcher:
+    """Known faces stored as one float32 matrix and matched in a single pass.
+
+    All faces of a frame are compared against the whole gallery with one
+    matrix product instead of calling ``compare_faces`` and ``face_distance``
+    per face. Instances are treated as immutable once built.
+
+    ``index`` is either a kind from :data:`index.INDEX_TYPES` (``'exact'`` by
+    default, ``'ivf'`` for large galleries) or an index already built over
+    the same encodings.
+
+    Several rows may share a name; a face matches the person with the
+    nearest row. Use :meth:`from_samples` to build per-person templates from
+    one encoding per photo.
+    """
+
+    def __init__(self, encodings=None, names=None, tolerance=DEFAULT_TOLERANCE, index='exact'):
+        self.matrix = as_matrix(encodings)
+        self.names = list(names or [])
+        if len(self.names) != len(self.matrix):
+            raise ValueError("encodings and names must have the same length")
+        self.tolerance = tolerance
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self.index = build_index(index, self.matrix) if isinstance(index, str) else index
+        people = {}
+        self.labels = np.array([people.setdefault(n, len(people)) for n in self.names], dtype=np.int64)
+        # Enough neighbours to always reach a second person.
+        self._k = int(np.bincount(self.labels).max()) + 1 if len(self.labels) else 2
+        self._key = None
+
+    @classmethod
+    def from_samples(cls, encodings=None, names=None, tolerance=DEFAULT_TOLERANCE, index='exact',
+                     max_samples=MAX_SAMPLES):
+        """Build a matcher over per-person templates (see :func:`build_templates`)."""
+        matrix, template_names = build_templates(encodings, names, max_samples)
+        return cls(matrix, template_names, tolerance, index)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def key(self):
+        """Digest of the gallery contents, used to key cached results."""
+        if self._key is None:
+            self._key = gallery_key(self.matrix, self.names, self.tolerance)
+        return self._key
+
+    def distances(self, encodings):
+        """Return the ``(faces, gallery)`` matrix of Euclidean distances."""
+        sq = squared_distances(as_matrix(encodings), self.matrix, self.sq_norms)
+        return np.sqrt(sq, out=sq)
+
+    def match(self, encodings):
+        """Return one :class:`Match` per encoding."""
+        if len(encodings) == 0:
+            return []
+        if not self.names:
+            return [Match(UNKNOWN, float('inf'), float('inf'), -1) for _ in encodings]
+        idx, dist = self.index.search(as_matrix(encodings), k=max(self._k, 2))
+        best = idx[:, 0]
+        best_dist = dist[:, 0]
+        labels = self.labels[np.maximum(idx, 0)]
+        other = (labels != labels[:, :1]) & (idx >= 0)
+        margins = np.where(other, dist, np.inf).min(axis=1) - best_dist
+        results = []
+        for i, d, m in zip(best.tolist(), best_dist.tolist(), margins.tolist()):
+            name = self.names[i] if i >= 0 and d <= self.tolerance else UNKNOWN
+            results.append(Match(name, d, m, i))
+        return results
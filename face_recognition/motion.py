@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+# Width of the grey thumbnail frames are compared at.
+MOTION_WIDTH = 160
+# Grey-level change (0-255) for a thumbnail pixel to count as changed.
+PIXEL_THRESHOLD = 25
+# Share of changed thumbnail pixels that counts as motion.
+MIN_CHANGED = 0.002
+# Let a frame through after this many consecutive still frames anyway, so a
+# person who walked in very slowly or lighting changes are picked up.
+FORCE_EVERY = 50
+
+
+class MotionGate:
+    """Skip face detection while the scene is unchanged.
+
+    Each frame is shrunk to a blurred grey thumbnail and compared with the
+    previous one; detection is only worth running when enough pixels changed.
+    ``checked`` and ``skipped`` count the frames seen and held back.
+    """
+
+    def __init__(self, pixel_threshold=PIXEL_THRESHOLD, min_changed=MIN_CHANGED,
+                 width=MOTION_WIDTH, force_every=FORCE_EVERY):
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.width = width
+        self.force_every = force_every
+        self.checked = 0
+        self.skipped = 0
+        self._previous = None
+        self._still = 0
+
+    def reset(self):
+        self._previous = None
+        self._still = 0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / float(width))
+        small = cv2.resize(frame, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                           interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(grey, (5, 5), 0)
+
+    def has_motion(self, frame):
+        """Return True if ``frame`` differs enough from the previous one."""
+        self.checked += 1
+        current = self._thumbnail(frame)
+        previous, self._previous = self._previous, current
+        if previous is None or previous.shape != current.shape:
+            self._still = 0
+            return True
+        changed = np.count_nonzero(cv2.absdiff(current, previous) > self.pixel_threshold)
+        if changed >= self.min_changed * current.size:
+            self._still = 0
+            return True
+        self._still += 1
+        if self.force_every and self._still >= self.force_every:
+            self._still = 0
+            return True
+        self.skipped += 1
+        return False
@@ -0,0 +1,291 @@
+"""Recognize faces from several cameras with a pool of worker processes.
+
+Each camera gets a capture thread that keeps only its newest frame and
+hands frames with motion to a process pool. Workers hold the known-face
+gallery read-only (received once when the pool starts, shared copy-on-write
+where the platform forks), so recognition scales with cores instead of
+being bound to one interpreter. Results from all cameras feed one
+deduplicated attendance stream. Run from the repository root::
+
+    python -m face_recognition.multicam --cameras 0 1 2 --workers 4
+"""
+import os
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import attendance
+from utils.dedup import AttendanceDeduper
+from utils.writer import AttendanceWriter
+from . import face_utils
+from .camera import Camera
+from .gallery import FaceGallery
+from .index import IVFIndex, build_index
+from .matcher import FaceMatcher
+from .motion import MotionGate
+
+# Frames of one camera that may be queued or running in the pool at once.
+MAX_IN_FLIGHT = 2
+STATS_INTERVAL = 10.0
+# Times a crashed pool (e.g. a worker killed by the OS) is replaced before
+# the recognizer gives up and stops.
+MAX_POOL_RESTARTS = 3
+
+_worker_matcher = None
+
+
+def pool_initargs(matcher):
+    """Return ``initargs`` for :func:`init_worker` that recreate ``matcher``."""
+    index_options = {}
+    if isinstance(matcher.index, IVFIndex):
+        index_options = {'centroids': matcher.index.centroids, 'n_probe': matcher.index.n_probe}
+    return matcher.matrix, matcher.names, matcher.tolerance, matcher.index.kind, index_options
+
+
+def init_worker(matrix, names, tolerance, index_kind, index_options):
+    """Process-pool initializer: build this worker's read-only matcher."""
+    global _worker_matcher
+    _worker_matcher = FaceMatcher(
+        matrix, names, tolerance, index=build_index(index_kind, matrix, **index_options)
+    )
+
+
+def recognize_frame(frame, scale=None):
+    """Recognize a BGR frame in a pool worker set up by :func:`init_worker`."""
+    locations, encodings, matches = face_utils.detect_and_match(frame, _worker_matcher, scale)
+    return locations, encodings, [m.name for m in matches]
+
+
+class CameraStats:
+    """Counters for one camera.
+
+    They are updated from the camera's capture thread and from pool
+    callback threads, so changes go through :meth:`add`.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self.read = 0
+        self.submitted = 0
+        self.processed = 0
+        self.busy = 0
+        self.still = 0
+        self.faces = 0
+        self.failed = 0
+        self.latency = 0.0
+
+    def add(self, **increments):
+        """Add to counters, e.g. ``add(processed=1, faces=2)``."""
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'camera': self.index,
+                'frames_read': self.read,
+                'frames_submitted': self.submitted,
+                'frames_processed': self.processed,
+                'skipped_busy': self.busy,
+                'skipped_still': self.still,
+                'faces': self.faces,
+                'failed': self.failed,
+                'mean_latency_ms': 1000.0 * self.latency / self.processed if self.processed else 0.0,
+            }
+
+
+class MultiCameraRecognizer:
+    """Capture from several cameras and recognize their frames in a process pool.
+
+    ``on_result(camera_index, locations, names)`` is called for every
+    processed frame, from a pool callback thread. Attendance is only logged
+    within :func:`attendance.allowed_time`, like the web stream.
+
+    If the pool breaks (a worker process died) it is replaced, at most
+    ``MAX_POOL_RESTARTS`` times; after that the recognizer stops.
+    """
+
+    def __init__(self, camera_indices, gallery, workers=None, scale=None,
+                 deduper=None, writer=None, on_result=None):
+        self.camera_indices = list(camera_indices)
+        self.gallery = gallery
+        self.workers = workers or os.cpu_count() or 1
+        self.scale = scale
+        self.deduper = deduper or AttendanceDeduper()
+        self.writer = writer or AttendanceWriter()
+        self.on_result = on_result
+        self.stats = {index: CameraStats(index) for index in self.camera_indices}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pool = None
+        self._pool_version = None
+        self.pool_restarts = 0
+
+    def _ensure_pool(self):
+        # Restart the pool when the gallery changed so workers see new faces.
+        with self._lock:
+            if self._pool is not None and self._pool_version == self.gallery.version:
+                return self._pool
+            old = self._pool
+            pool = self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=pool_initargs(self.gallery.matcher),
+            )
+            self._pool_version = self.gallery.version
+        if old is not None:
+            old.shutdown(wait=False)
+        return pool
+
+    def _pool_broken(self, pool, error):
+        """Replace a broken pool, or stop once it has broken too often."""
+        with self._lock:
+            if self._pool is not pool:
+                # Already replaced by another thread.
+                return
+            self._pool = None
+            self.pool_restarts += 1
+            give_up = self.pool_restarts > MAX_POOL_RESTARTS
+        pool.shutdown(wait=False)
+        if give_up:
+            logging.error("Recognition pool failed %d times (%s); stopping", self.pool_restarts, error)
+            self._stop.set()
+        else:
+            logging.error("Recognition pool failed (%s); restarting it", error)
+
+    def start(self):
+        self._stop.clear()
+        self._ensure_pool()
+        for index in self.camera_indices:
+            thread = threading.Thread(target=self._capture_loop, args=(index,),
+                                      name=f'camera-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.writer.flush()
+
+    @property
+    def running(self):
+        """False once stopped or once every camera's capture thread has exited."""
+        return not self._stop.is_set() and any(t.is_alive() for t in self._threads)
+
+    def stats_summary(self):
+        return [s.as_dict() for s in self.stats.values()]
+
+    def _capture_loop(self, index):
+        stats = self.stats[index]
+        camera = Camera(index, threaded=True)
+        motion = MotionGate()
+        in_flight = threading.Semaphore(MAX_IN_FLIGHT)
+        try:
+            if not camera.is_opened():
+                logging.error("Could not open camera %s", index)
+                return
+            while not self._stop.is_set():
+                latest = camera.read_latest()
+                if latest is None:
+                    logging.warning("Camera %s stopped delivering frames", index)
+                    break
+                frame = latest[2]
+                if not motion.has_motion(frame):
+                    stats.add(read=1, still=1)
+                    continue
+                if not in_flight.acquire(blocking=False):
+                    stats.add(read=1, busy=1)
+                    continue
+                stats.add(read=1, submitted=1)
+                pool = self._ensure_pool()
+                try:
+                    future = pool.submit(recognize_frame, frame, self.scale)
+                except BrokenProcessPool as e:
+                    in_flight.release()
+                    stats.add(failed=1)
+                    self._pool_broken(pool, e)
+                    continue
+                future.add_done_callback(
+                    lambda f, frame=frame, started=time.monotonic(), pool=pool:
+                    self._on_done(index, frame, started, f, in_flight, pool)
+                )
+        finally:
+            camera.release()
+
+    def _on_done(self, index, frame, started, future, in_flight, pool):
+        in_flight.release()
+        stats = self.stats[index]
+        try:
+            locations, encodings, names = future.result()
+        except BrokenProcessPool as e:
+            stats.add(failed=1)
+            self._pool_broken(pool, e)
+            return
+        except Exception as e:
+            stats.add(failed=1)
+            logging.error("Recognition failed for camera %s: %s", index, e)
+            return
+        stats.add(processed=1, latency=time.monotonic() - started, faces=len(locations))
+        if self.on_result:
+            self.on_result(index, locations, names)
+        if not attendance.allowed_time():
+            return
+        for (top, right, bottom, left), name, encoding in zip(locations, names, encodings):
+            if not self.deduper.should_log(name, encoding):
+                continue
+            if name == 'Unknown':
+                folder = attendance.UNKNOWN_DIR
+                status = 'Unknown - Logged'
+            else:
+                folder = attendance.SNAPSHOT_DIR
+                status = 'Present'
+            self.writer.submit(name, frame[top:bottom, left:right], folder, status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cameras', type=int, nargs='+',
+                        help='camera indices (default: every camera found)')
+    parser.add_argument('--workers', type=int, default=None, help='recognition processes')
+    parser.add_argument('--scale', type=float, default=None, help='detection scale')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    cameras = args.cameras
+    if not cameras:
+        from cv2_enumerate_cameras import enumerate_cameras
+        cameras = sorted({cam.index for cam in enumerate_cameras()})
+    if not cameras:
+        parser.error("no cameras found")
+    attendance.ensure_dirs()
+    gallery = FaceGallery(attendance.KNOWN_DIR)
+    gallery.load()
+    recognizer = MultiCameraRecognizer(cameras, gallery, workers=args.workers, scale=args.scale)
+    recognizer.start()
+    try:
+        while recognizer.running:
+            time.sleep(STATS_INTERVAL)
+            for row in recognizer.stats_summary():
+                logging.info("camera %(camera)s: read=%(frames_read)d processed=%(frames_processed)d "
+                             "busy=%(skipped_busy)d still=%(skipped_still)d faces=%(faces)d "
+                             "latency=%(mean_latency_ms).0fms", row)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recognizer.stop()
+        recognizer.writer.close()
+
+
+if __name__ == '__main__':
+    main()
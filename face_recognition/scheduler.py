@@ -0,0 +1,55 @@
+import time
+
+# Analysis rate to aim for when the machine is fast enough.
+TARGET_FPS = 10.0
+# Largest share of wall time recognition may use, leaving the rest for
+# reading and displaying frames.
+MAX_BUSY = 0.5
+# Weight of the newest sample in the latency moving average.
+SMOOTHING = 0.2
+
+
+class FrameScheduler:
+    """Decide which frames to analyse from the measured recognition latency.
+
+    Every frame is displayed; a frame is analysed only when the previous
+    analysis has finished and enough time has passed. The wait is the
+    target interval on fast machines and grows with the measured latency on
+    slow ones, so analysis never takes more than ``max_busy`` of wall time.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, max_busy=MAX_BUSY, smoothing=SMOOTHING):
+        self.interval = 1.0 / target_fps if target_fps else 0.0
+        self.max_busy = max_busy
+        self.smoothing = smoothing
+        self.latency = None
+        self.processed = 0
+        self.skipped = 0
+        self._next_due = 0.0
+
+    def should_process(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now < self._next_due:
+            self.skipped += 1
+            return False
+        return True
+
+    def record(self, started, finished=None):
+        """Record one analysis that ran from ``started`` to ``finished`` (monotonic)."""
+        finished = time.monotonic() if finished is None else finished
+        sample = finished - started
+        if self.latency is None:
+            self.latency = sample
+        else:
+            self.latency += self.smoothing * (sample - self.latency)
+        idle = self.latency * (1.0 / self.max_busy - 1.0)
+        self._next_due = max(started + self.interval, finished + idle)
+        self.processed += 1
+
+    @property
+    def analysis_fps(self):
+        """Analysis rate the scheduler currently allows."""
+        if not self.latency:
+            return 1.0 / self.interval if self.interval else 0.0
+        period = max(self.interval, self.latency / self.max_busy)
+        return 1.0 / period
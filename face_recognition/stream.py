@@ -0,0 +1,133 @@
+import logging
+import threading
+
+import cv2
+
+from .camera import Camera
+
+BOUNDARY_PREFIX = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class CameraStream:
+    """One capture-and-process worker per camera shared by every viewer.
+
+    The worker reads frames, passes each one through ``process_frame`` (which
+    returns the annotated frame to show) and publishes it JPEG-encoded.
+    Subscribers only wait for the next published frame, so extra viewers cost
+    socket writes rather than extra recognition. The worker starts with the
+    first subscriber and stops after the last one leaves.
+    """
+
+    def __init__(self, process_frame, camera_index=0):
+        self.process_frame = process_frame
+        self.camera_index = camera_index
+        self._cond = threading.Condition()
+        self._control = threading.Lock()
+        self._jpeg = None
+        self._frame_id = 0
+        self._ended = False
+        self._subscribers = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def frames(self):
+        """Yield multipart MJPEG chunks until the client goes away or the camera fails."""
+        self._subscribe()
+        try:
+            last_id = self._frame_id
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._frame_id != last_id or self._ended, timeout=1.0)
+                    if self._frame_id == last_id:
+                        if self._ended:
+                            return
+                        continue
+                    last_id = self._frame_id
+                    jpeg = self._jpeg
+                yield BOUNDARY_PREFIX + jpeg + b'\r\n'
+        finally:
+            self._unsubscribe()
+
+    def switch(self, camera_index, on_stopped=None):
+        """Point the shared worker at another camera.
+
+        ``on_stopped`` is called after the old camera's worker has stopped and
+        before the new one starts, so state kept about the previous camera
+        (tracks, motion history) can be reset while no frame is in flight.
+        """
+        with self._control:
+            self.camera_index = camera_index
+            running = self._thread is not None
+            self._stop_worker()
+            if on_stopped is not None:
+                on_stopped()
+            if running:
+                self._start_worker()
+
+    def close(self):
+        with self._control:
+            self._stop_worker()
+
+    def _subscribe(self):
+        with self._control:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._start_worker()
+
+    def _unsubscribe(self):
+        with self._control:
+            self._subscribers -= 1
+            if self._subscribers <= 0:
+                self._subscribers = 0
+                self._stop_worker()
+
+    def _start_worker(self):
+        # Called with the control lock held.
+        with self._cond:
+            self._ended = False
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(self.camera_index,), name='camera-stream', daemon=True
+        )
+        self._thread.start()
+
+    def _stop_worker(self):
+        # Called with the control lock held.
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run(self, camera_index):
+        # The grabber thread keeps only the newest frame, so a slow
+        # process_frame never works on (or shows) stale buffered frames.
+        camera = Camera(camera_index, threaded=True)
+        try:
+            while not self._stop.is_set():
+                frame = camera.read_frame()
+                if frame is None:
+                    logging.warning("Camera %s stopped delivering frames", camera_index)
+                    break
+                try:
+                    frame = self.process_frame(frame)
+                except Exception as e:
+                    logging.error("Frame processing failed: %s", e)
+                ret, buffer = cv2.imencode('.jpg', frame)
+                if not ret:
+                    continue
+                with self._cond:
+                    self._jpeg = buffer.tobytes()
+                    self._frame_id += 1
+                    self._cond.notify_all()
+        finally:
+            camera.release()
+            if not self._stop.is_set():
+                with self._cond:
+                    self._ended = True
+                    self._cond.notify_all()
@@ -0,0 +1,152 @@
+import cv2
+import face_recognition
+
+from . import face_utils
+from .matcher import UNKNOWN
+
+# Minimum overlap for a detection to continue an existing track.
+MIN_IOU = 0.3
+# A detection whose centre moved less than this fraction of the box width is
+# still associated when the overlap is too small (fast movement). Such a
+# match may belong to a neighbouring face, so the track is re-verified.
+MAX_CENTRE_SHIFT = 0.5
+# Processed frames a track survives without a matching detection.
+MAX_MISSED = 5
+# Processed frames after which a tracked face is encoded and matched again.
+REVERIFY_EVERY = 15
+
+
+def iou(a, b):
+    top, right, bottom, left = a
+    top2, right2, bottom2, left2 = b
+    inter_w = max(0, min(right, right2) - max(left, left2))
+    inter_h = max(0, min(bottom, bottom2) - max(top, top2))
+    inter = inter_w * inter_h
+    union = (right - left) * (bottom - top) + (right2 - left2) * (bottom2 - top2) - inter
+    return inter / union if union else 0.0
+
+
+def centre_shift(a, b):
+    """Distance between box centres relative to the width of ``a``."""
+    top, right, bottom, left = a
+    top2, right2, bottom2, left2 = b
+    dx = (left + right - left2 - right2) / 2.0
+    dy = (top + bottom - top2 - bottom2) / 2.0
+    width = max(right - left, 1)
+    return (dx * dx + dy * dy) ** 0.5 / width
+
+
+class Track:
+    """A face followed across frames with its last recognition result."""
+
+    def __init__(self, track_id, location):
+        self.track_id = track_id
+        self.location = location
+        self.name = UNKNOWN
+        self.distance = float('inf')
+        self.encoding = None
+        self.encoded_at = None
+        self.missed = 0
+        # True when the track was (re-)encoded on the latest frame.
+        self.fresh = False
+
+
+class FaceTracker:
+    """Associate detections with tracks by overlap, falling back to centre distance."""
+
+    def __init__(self, min_iou=MIN_IOU, max_missed=MAX_MISSED, reverify_every=REVERIFY_EVERY):
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.reverify_every = reverify_every
+        self.tracks = []
+        self.frame_count = 0
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, locations):
+        """Return one track per location, creating tracks for new faces."""
+        self.frame_count += 1
+        candidates = []
+        for ti, track in enumerate(self.tracks):
+            for li, loc in enumerate(locations):
+                overlap = iou(track.location, loc)
+                if overlap >= self.min_iou:
+                    candidates.append((overlap, ti, li))
+                elif centre_shift(track.location, loc) <= MAX_CENTRE_SHIFT:
+                    candidates.append((0.0, ti, li))
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        assigned = [None] * len(locations)
+        used = set()
+        for overlap, ti, li in candidates:
+            if ti in used or assigned[li] is not None:
+                continue
+            used.add(ti)
+            track = assigned[li] = self.tracks[ti]
+            if overlap < self.min_iou:
+                # Associated by centre distance only: two nearby faces can
+                # swap tracks here, so encode and match it on this frame.
+                track.encoded_at = None
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in used:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        for li, loc in enumerate(locations):
+            track = assigned[li]
+            if track is None:
+                track = Track(self._next_id, loc)
+                self._next_id += 1
+                survivors.append(track)
+            track.location = loc
+            track.missed = 0
+            track.fresh = False
+            assigned[li] = track
+        self.tracks = survivors
+        return assigned
+
+    def needs_encoding(self, track):
+        return (track.encoded_at is None
+                or self.frame_count - track.encoded_at >= self.reverify_every)
+
+
+class TrackingRecognizer:
+    """Detect faces every frame but encode only new or due-for-reverification tracks.
+
+    Detection (downscaled, see :func:`face_utils.detect_faces`) keeps boxes
+    current; the 128-d encoding, which dominates the cost once detection is
+    cheap, runs once per new face and every ``reverify_every`` frames.
+    """
+
+    def __init__(self, tracker=None, scale=None, model=face_utils.DETECTION_MODEL):
+        self.tracker = tracker or FaceTracker()
+        self.scale = scale
+        self.model = model
+        self.encoded = 0
+        self.reused = 0
+
+    def reset(self):
+        self.tracker.reset()
+
+    def process(self, image, matcher):
+        """Return the tracks visible in a BGR image; ``track.fresh`` marks new results."""
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        locations = face_utils.detect_faces(rgb, self.scale, self.model)
+        tracks = self.tracker.update(locations)
+        due = [t for t in tracks if self.tracker.needs_encoding(t)]
+        if due:
+            encodings = face_recognition.face_encodings(rgb, [t.location for t in due])
+            for track, encoding, match in zip(due, encodings, matcher.match(encodings)):
+                track.encoding = encoding
+                track.name = match.name
+                track.distance = match.distance
+                track.encoded_at = self.tracker.frame_count
+                track.fresh = True
+        self.encoded += len(due)
+        self.reused += len(tracks) - len(due)
+        return tracks
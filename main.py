@@ -1,18 +1,27 @@
 import os
+import logging
 import threading
 import time
 import webbrowser
-from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog, messagebox
 from PIL import Image, ImageTk
-import numpy as np
 import cv2
 from cv2_enumerate_cameras import enumerate_cameras
-import face_recognition
 
 from face_recognition import face_utils
+from face_recognition.camera import Camera
+from face_recognition.gallery import FaceGallery
+from face_recognition.motion import MotionGate
+from face_recognition.scheduler import FrameScheduler
+from face_recognition.tracker import TrackingRecognizer
 from utils import attendance
+from utils.dedup import AttendanceDeduper
+from utils.writer import AttendanceWriter
+
+# Search structure for the known-face gallery: 'exact' or 'ivf' for very
+# large (whole-school) galleries.
+GALLERY_INDEX = 'exact'
 
 
 class AttendanceApp:
@@ -65,10 +74,16 @@ class AttendanceApp:
         self.cap = None
         self.capture_thread = None
         self.stop_event = threading.Event()
-        self.process_next = True
-        self.last_unknown = 0
+        self.scheduler = FrameScheduler()
+        self.motion = MotionGate()
+        self.last_faces = []
+        self.recognizer = TrackingRecognizer()
+        self.deduper = AttendanceDeduper()
+        self.writer = AttendanceWriter(on_flush=self.on_records_written)
         self.dashboard_opened = False
 
+        self.gallery = FaceGallery(attendance.KNOWN_DIR, index=GALLERY_INDEX,
+                                   index_file=face_utils.INDEX_FILE)
         self.load_known_faces()
         self.root.protocol('WM_DELETE_WINDOW', self.on_close)
 
@@ -82,12 +97,17 @@ class AttendanceApp:
     def start_system(self):
         if self.cap is not None:
             return
-        self.cap = cv2.VideoCapture(self.camera_index)
-        if not self.cap.isOpened():
+        self.cap = Camera(self.camera_index, threaded=True)
+        if not self.cap.is_opened():
             messagebox.showerror("خطأ", "تعذر فتح الكاميرا")
+            self.cap.release()
             self.cap = None
             return
         self.stop_event.clear()
+        self.recognizer.reset()
+        self.scheduler = FrameScheduler()
+        self.motion = MotionGate()
+        self.last_faces = []
         self.capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
         self.capture_thread.start()
         self.start_btn.config(state=tk.DISABLED)
@@ -101,20 +121,26 @@ class AttendanceApp:
             self.capture_thread.join()
         self.cap.release()
         self.cap = None
+        self.writer.flush()
         cv2.destroyAllWindows()
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
-        self.status_var.set("تم إيقاف النظام")
+        self.status_var.set(
+            f"تم إيقاف النظام - إطارات بدون حركة: {self.motion.skipped}/{self.motion.checked}"
+        )
 
     def capture_loop(self):
         while not self.stop_event.is_set():
-            ret, frame = self.cap.read()
-            if not ret:
+            frame = self.cap.read_frame()
+            if frame is None:
                 break
             display = frame.copy()
-            if self.process_next:
-                self.detect_faces(frame, display)
-            self.process_next = not self.process_next
+            if self.scheduler.should_process() and self.motion.has_motion(frame):
+                started = time.monotonic()
+                self.last_faces = self.detect_faces(frame)
+                self.scheduler.record(started)
+            # Frames that are not analysed show the latest known boxes.
+            self.draw_faces(display, self.last_faces)
             cv2.imshow("Live Feed", display)
             if cv2.waitKey(1) & 0xFF == 27:
                 self.stop_event.set()
@@ -122,53 +148,51 @@ class AttendanceApp:
         self.stop_system()
 
     # ------------------ Face recognition and logging ------------------
-    def detect_faces(self, frame, display):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        locations = face_recognition.face_locations(rgb)
-        encodings = face_recognition.face_encodings(rgb, locations)
-        names = []
-        for enc in encodings:
-            name = "Unknown"
-            if self.known_encodings:
-                matches = face_recognition.compare_faces(self.known_encodings, enc)
-                dist = face_recognition.face_distance(self.known_encodings, enc)
-                if len(dist) > 0:
-                    best = int(np.argmin(dist))
-                    if matches[best]:
-                        name = self.known_names[best]
-            names.append(name)
-
-        for (top, right, bottom, left), name in zip(locations, names):
-            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-            cv2.rectangle(display, (left, top), (right, bottom), color, 2)
-            cv2.rectangle(display, (left, bottom - 20), (right, bottom), color, cv2.FILLED)
-            cv2.putText(display, name, (left + 5, bottom - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-            snap = frame[top:bottom, left:right]
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    def detect_faces(self, frame):
+        """Recognize faces, queue attendance records and return ``(location, name)`` pairs."""
+        faces = []
+        for track in self.recognizer.process(frame, self.gallery.matcher):
+            top, right, bottom, left = track.location
+            name = track.name
+            faces.append((track.location, name))
+            if not track.fresh or not self.deduper.should_log(name, track.encoding):
+                continue
             if name == "Unknown":
-                if time.time() - self.last_unknown < 5:
-                    continue
-                self.last_unknown = time.time()
                 folder = attendance.UNKNOWN_DIR
                 status = "Unknown - Logged"
             else:
-                if attendance.was_logged_today(name):
-                    continue
                 folder = attendance.SNAPSHOT_DIR
                 status = "Present"
-            os.makedirs(folder, exist_ok=True)
-            path = os.path.join(folder, f"{name}_{timestamp}.jpg")
-            cv2.imwrite(path, snap)
-            attendance.log_entry(name, path, status)
-            if not self.dashboard_opened:
-                self.open_dashboard()
-                self.dashboard_opened = True
+            self.writer.submit(name, frame[top:bottom, left:right], folder, status)
+        return faces
+
+    def draw_faces(self, display, faces):
+        for (top, right, bottom, left), name in faces:
+            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+            cv2.rectangle(display, (left, top), (right, bottom), color, 2)
+            cv2.rectangle(display, (left, bottom - 20), (right, bottom), color, cv2.FILLED)
+            cv2.putText(display, name, (left + 5, bottom - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+    def on_records_written(self, records):
+        # Runs on the writer thread after each batch is on disk. Only the new
+        # rows are added to the dashboard file, which the page reloads.
+        try:
+            path = attendance.generate_dashboard_html()
+        except Exception as e:
+            logging.error("Could not update dashboard: %s", e)
+            return
+        if not self.dashboard_opened:
+            self.dashboard_opened = True
+            webbrowser.open('file://' + os.path.abspath(path))
 
     # ------------------ Known faces management ------------------
     def load_known_faces(self):
-        self.known_encodings, self.known_names = face_utils.load_known_faces(attendance.KNOWN_DIR)
+        self.gallery.load()
+        self.refresh_tree()
+
+    def refresh_tree(self):
         self.tree.delete(*self.tree.get_children())
-        for name in sorted(set(self.known_names)):
+        for name in sorted(set(self.gallery.names)):
             self.tree.insert('', 'end', values=(name,))
 
     def add_face(self):
@@ -178,16 +202,18 @@ class AttendanceApp:
         name = simpledialog.askstring('الاسم', 'أدخل اسم الشخص:')
         if not name:
             return
+        added = []
         for f in files:
-            ext = os.path.splitext(f)[1]
-            dest = os.path.join(attendance.KNOWN_DIR, f"{name}_{int(time.time())}{ext}")
+            dest = attendance.new_photo_path(name, os.path.splitext(f)[1])
             try:
                 os.makedirs(attendance.KNOWN_DIR, exist_ok=True)
                 with open(f, 'rb') as src, open(dest, 'wb') as dst:
                     dst.write(src.read())
             except Exception:
-                pass
-        self.load_known_faces()
+                continue
+            added.append(dest)
+        self.gallery.add_images(added)
+        self.refresh_tree()
 
     def rename_face(self):
         sel = self.tree.focus()
@@ -197,14 +223,15 @@ class AttendanceApp:
         new = simpledialog.askstring('تعديل الاسم', 'الاسم الجديد:', initialvalue=old)
         if not new or new == old:
             return
+        renames = []
         for fname in os.listdir(attendance.KNOWN_DIR):
-            if fname.startswith(old):
-                ext = os.path.splitext(fname)[1]
-                os.rename(
-                    os.path.join(attendance.KNOWN_DIR, fname),
-                    os.path.join(attendance.KNOWN_DIR, f"{new}_{int(time.time())}{ext}")
-                )
-        self.load_known_faces()
+            if attendance.person_name(fname) == old:
+                old_path = os.path.join(attendance.KNOWN_DIR, fname)
+                new_path = attendance.new_photo_path(new, os.path.splitext(fname)[1])
+                os.rename(old_path, new_path)
+                renames.append((old_path, new_path))
+        self.gallery.rename_images(renames)
+        self.refresh_tree()
 
     def delete_face(self):
         sel = self.tree.focus()
@@ -213,20 +240,30 @@ class AttendanceApp:
         name = self.tree.item(sel)['values'][0]
         if not messagebox.askyesno('حذف', f'حذف جميع صور {name}?'):
             return
+        removed = []
         for fname in os.listdir(attendance.KNOWN_DIR):
-            if fname.startswith(name):
-                os.remove(os.path.join(attendance.KNOWN_DIR, fname))
-        self.load_known_faces()
+            if attendance.person_name(fname) == name:
+                path = os.path.join(attendance.KNOWN_DIR, fname)
+                os.remove(path)
+                removed.append(path)
+        self.gallery.remove_images(removed)
+        self.refresh_tree()
 
     # ------------------ Dashboard ------------------
     def open_dashboard(self):
-        path = attendance.generate_dashboard_html()
-        webbrowser.open('file://' + os.path.abspath(path))
+        # The first build reads today's records from the log; keep it off
+        # the Tk thread.
+        def build_and_open():
+            path = attendance.generate_dashboard_html()
+            webbrowser.open('file://' + os.path.abspath(path))
+
+        threading.Thread(target=build_and_open, name='dashboard', daemon=True).start()
 
     # ------------------ Closing ------------------
     def on_close(self):
         if messagebox.askokcancel('خروج', 'هل تريد إغلاق النظام؟'):
             self.stop_system()
+            self.writer.close()
             self.root.destroy()
 
 
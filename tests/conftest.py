@@ -0,0 +1,26 @@
+import os
+from collections import OrderedDict
+
+import pytest
+
+from utils import attendance
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run in an empty working directory with fresh attendance module state.
+
+    The attendance paths are relative ('data/...'), so changing directory
+    points every log, snapshot and dashboard file at ``tmp_path``.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(attendance, 'DASHBOARD_TEMPLATE',
+                        os.path.join(REPO_DIR, attendance.DASHBOARD_TEMPLATE))
+    monkeypatch.setattr(attendance, '_migrated', False)
+    monkeypatch.setattr(attendance, '_logged_by_day', OrderedDict())
+    monkeypatch.setattr(attendance, '_index_offset', 0)
+    monkeypatch.setattr(attendance, '_stats', attendance._LogStats())
+    monkeypatch.setattr(attendance, '_dashboard', attendance.DashboardFile())
+    return tmp_path
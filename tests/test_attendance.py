@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+
+from utils import attendance
+
+
+def record(name, when, status='Present'):
+    return attendance.make_record(name, f'data/snapshots/{name}.jpg', status, when)
+
+
+def today_at(hour, minute=0):
+    return datetime.combine(date.today(), time(hour, minute))
+
+
+def test_append_and_read_back(data_dir):
+    attendance.append_records([record('Ali', today_at(8)), record('منى', today_at(9))])
+    attendance.log_entry('Sara', 'snap.jpg', 'Present')
+
+    names = [r['name'] for r in attendance.iter_log()]
+    assert names == ['Ali', 'منى', 'Sara']
+    with open(attendance.ATTENDANCE_FILE, 'rb') as f:
+        assert f.read().count(b'\n') == 3
+
+
+def test_append_after_torn_line_keeps_new_records(data_dir):
+    attendance.append_records([record('Ali', today_at(8))])
+    with open(attendance.ATTENDANCE_FILE, 'ab') as f:
+        f.write(b'{"name": "interrupted')
+
+    attendance.append_records([record('Sara', today_at(9)), record('Omar', today_at(10))])
+
+    assert [r['name'] for r in attendance.iter_log()] == ['Ali', 'Sara', 'Omar']
+
+
+def test_read_log_from_leaves_partial_line(data_dir):
+    attendance.append_records([record('Ali', today_at(8))])
+    with open(attendance.ATTENDANCE_FILE, 'ab') as f:
+        f.write(b'{"name": "Sa')
+
+    entries, end = attendance.read_log_from(0)
+    assert [rec['name'] for _, rec in entries] == ['Ali']
+    assert entries[0][0] == 0
+
+    with open(attendance.ATTENDANCE_FILE, 'ab') as f:
+        f.write(b'ra"}\n')
+    entries, end2 = attendance.read_log_from(end)
+    assert [rec['name'] for _, rec in entries] == ['Sara']
+    assert end2 == os.path.getsize(attendance.ATTENDANCE_FILE)
+
+
+def test_read_log_from_reports_replaced_log(data_dir):
+    attendance.append_records([record('Ali', today_at(8)), record('Sara', today_at(9))])
+    _, end = attendance.read_log_from(0)
+    os.replace(attendance.ATTENDANCE_FILE, attendance.ATTENDANCE_FILE + '.old')
+    attendance.append_records([record('Omar', today_at(10))])
+
+    assert attendance.read_log_from(end) is None
+
+
+def test_migrates_legacy_log(data_dir):
+    os.makedirs(attendance.LOG_DIR)
+    legacy = [record('Ali', today_at(8)), record('Sara', today_at(9))]
+    with open(attendance.LEGACY_ATTENDANCE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    assert attendance.load_log() == legacy
+    assert not os.path.exists(attendance.LEGACY_ATTENDANCE_FILE)
+    assert os.path.exists(attendance.LEGACY_ATTENDANCE_FILE + '.migrated')
+
+
+def test_failed_migration_is_retried(data_dir):
+    os.makedirs(attendance.LOG_DIR)
+    with open(attendance.LEGACY_ATTENDANCE_FILE, 'w', encoding='utf-8') as f:
+        f.write('[{"name": ')
+
+    assert attendance.load_log() == []
+    assert os.path.exists(attendance.LEGACY_ATTENDANCE_FILE)
+
+    with open(attendance.LEGACY_ATTENDANCE_FILE, 'w', encoding='utf-8') as f:
+        json.dump([record('Ali', today_at(8))], f)
+    assert [r['name'] for r in attendance.load_log()] == ['Ali']
+
+
+def test_was_logged_on_checks_the_given_day(data_dir):
+    yesterday = today_at(8) - timedelta(days=1)
+    attendance.append_records([record('Ali', yesterday)])
+
+    assert attendance.was_logged_on('Ali', yesterday.date())
+    assert not attendance.was_logged_today('Ali')
+
+    attendance.append_records([record('Ali', today_at(9))])
+    assert attendance.was_logged_today('Ali')
+
+
+def test_was_logged_on_sees_other_writers(data_dir):
+    attendance.append_records([record('Sara', today_at(8))])
+    assert not attendance.was_logged_today('Ali')
+
+    # Another process (the GUI or the web server) appends directly.
+    with open(attendance.ATTENDANCE_FILE, 'ab') as f:
+        f.write((json.dumps(record('Ali', today_at(9))) + '\n').encode('utf-8'))
+    assert attendance.was_logged_today('Ali')
+
+    # Appends after an unread record are picked up too.
+    attendance.append_records([record('Omar', today_at(10))])
+    assert attendance.was_logged_today('Omar')
+    assert attendance.was_logged_today('Sara')
+
+
+def test_was_logged_on_after_log_is_replaced(data_dir):
+    attendance.append_records([record('Ali', today_at(8)), record('Omar', today_at(8))])
+    assert attendance.was_logged_today('Ali')
+
+    os.remove(attendance.ATTENDANCE_FILE)
+    attendance.append_records([record('Sara', today_at(9))])
+    assert attendance.was_logged_today('Sara')
+    assert not attendance.was_logged_today('Ali')
+
+
+def test_allowed_time():
+    day = date(2026, 10, 17)
+    assert attendance.allowed_time(datetime.combine(day, time(6, 30)))
+    assert attendance.allowed_time(datetime.combine(day, time(15, 0)))
+    assert not attendance.allowed_time(datetime.combine(day, time(6, 29)))
+    assert not attendance.allowed_time(datetime.combine(day, time(15, 1)))
+
+
+def test_person_name():
+    assert attendance.person_name('data/known_faces/Ali_1700000000.jpg') == 'Ali'
+    assert attendance.person_name('Ali.png') == 'Ali'
+    assert attendance.person_name('Ali_Hassan.jpg') == 'Ali_Hassan'
+    assert attendance.person_name('_123.jpg') == '_123'
+
+
+def test_stats_follow_appends_and_other_writers(data_dir):
+    attendance.append_records([
+        record('Ali', today_at(8)),
+        record('Ali', today_at(8, 5)),
+        record('Unknown', today_at(8, 10), 'Unknown - Logged'),
+        record('Sara', today_at(8) - timedelta(days=1)),
+        record('Sara', today_at(8) - timedelta(days=2)),
+        record('Sara', today_at(8) - timedelta(days=3)),
+    ])
+    stats = attendance.get_stats()
+    assert stats['today_count'] == 1
+    assert stats['present'] == 2
+    assert stats['unknown'] == 1
+    assert stats['frequent'] == 'Sara'
+
+    # Another process appends directly to the file.
+    with open(attendance.ATTENDANCE_FILE, 'ab') as f:
+        f.write((json.dumps(record('Omar', today_at(9))) + '\n').encode('utf-8'))
+    stats = attendance.get_stats()
+    assert stats['today_count'] == 2
+    assert stats['present'] == 3
+
+
+def test_stats_recount_a_replaced_log(data_dir):
+    attendance.append_records([record('Ali', today_at(8)), record('Sara', today_at(9))])
+    assert attendance.get_stats()['today_count'] == 2
+
+    os.remove(attendance.ATTENDANCE_FILE)
+    attendance.append_records([record('Omar', today_at(10))])
+    assert attendance.get_stats()['today_count'] == 1
+
+
+def test_stats_while_another_thread_appends(data_dir):
+    attendance.append_records([record('Ali', today_at(8))])
+
+    def write():
+        for i in range(200):
+            attendance.append_records([record(f'P{i}', today_at(9))])
+
+    def read():
+        for _ in range(200):
+            attendance.get_stats()
+
+    threads = [threading.Thread(target=write, daemon=True),
+               threading.Thread(target=read, daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert attendance.get_stats()['today_count'] == 201
+
+
+def test_stats_count_enrolled_people(data_dir):
+    attendance.ensure_dirs()
+    for filename in ('Ali_1.jpg', 'Ali_2.jpg', 'Sara.png', 'notes.txt'):
+        open(os.path.join(attendance.KNOWN_DIR, filename), 'wb').close()
+    assert attendance.get_stats()['total_students'] == 2
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls.combine(date.today(), time(12, 34, 56))
+
+
+def test_dashboard_file_appends_match_a_full_render(data_dir, monkeypatch):
+    monkeypatch.setattr(attendance, 'datetime', FixedDatetime)
+    attendance.append_records([record('Ali', today_at(8)),
+                               record('Ali', today_at(8) - timedelta(days=1))])
+    dashboard = attendance.DashboardFile()
+    path = dashboard.refresh()
+
+    attendance.append_records([record('Sara', today_at(9)),
+                               record('Unknown', today_at(9, 30), 'Unknown - Logged')])
+    dashboard.refresh()
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        html = f.read()
+    today = [r for r in attendance.iter_log() if r['timestamp'].startswith(date.today().isoformat())]
+    assert html == attendance.render_dashboard_html(today)
+    assert html.count('<tr>') - attendance.render_dashboard_html([]).count('<tr>') == 3
+    assert '12:34:56' in html
+
+
+def test_dashboard_file_rebuilds_when_edited(data_dir):
+    attendance.append_records([record('Ali', today_at(8))])
+    dashboard = attendance.DashboardFile()
+    path = dashboard.refresh()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('<!-- edited -->')
+
+    attendance.append_records([record('Sara', today_at(9))])
+    dashboard.refresh()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    assert 'edited' not in html
+    assert 'Sara' in html and 'Ali' in html
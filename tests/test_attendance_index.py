@@ -0,0 +1,85 @@
+import os
+from datetime import datetime
+
+from utils import attendance
+from utils.attendance_index import AttendanceIndex
+
+
+def append(name, timestamp, status='Present'):
+    attendance.append_records([
+        attendance.make_record(name, f'data/snapshots/{name}.jpg', status, datetime.fromisoformat(timestamp))
+    ])
+
+
+def fill_log():
+    append('Sara', '2026-10-15T08:10:00')
+    append('Ali', '2026-10-15T08:00:00')
+    append('Unknown', '2026-10-16T08:30:00', 'Unknown - Logged')
+    append('Ali', '2026-10-16T08:05:00')
+    append('Alia', '2026-10-17T07:55:00')
+
+
+def names(result):
+    return [r['name'] for r in result['records']]
+
+
+def test_query_returns_all_records_oldest_first(data_dir):
+    fill_log()
+    result = AttendanceIndex().query()
+
+    assert names(result) == ['Ali', 'Sara', 'Ali', 'Unknown', 'Alia']
+    assert result['total'] == 5
+    assert result['counts'] == {'present': 4, 'unknown': 1}
+
+
+def test_query_filters(data_dir):
+    fill_log()
+    index = AttendanceIndex()
+
+    assert names(index.query(start='2026-10-16')) == ['Ali', 'Unknown', 'Alia']
+    assert names(index.query(end='2026-10-15')) == ['Ali', 'Sara']
+    assert names(index.query(start='2026-10-16', end='2026-10-16')) == ['Ali', 'Unknown']
+    assert names(index.query(name='ali')) == ['Ali', 'Ali', 'Alia']
+    assert names(index.query(status='Present', start='2026-10-16')) == ['Ali', 'Alia']
+    assert names(index.query(status='Unknown - Logged')) == ['Unknown']
+    assert index.query(status='Absent')['total'] == 0
+
+
+def test_query_pages(data_dir):
+    fill_log()
+    index = AttendanceIndex()
+
+    first = index.query(page=1, per_page=2)
+    last = index.query(page=3, per_page=2)
+    assert first['pages'] == 3
+    assert names(first) == ['Ali', 'Sara']
+    assert names(last) == ['Alia']
+    assert index.query(page=4, per_page=2)['records'] == []
+
+
+def test_index_follows_appends(data_dir):
+    fill_log()
+    index = AttendanceIndex()
+    assert index.query()['total'] == 5
+
+    append('Omar', '2026-10-17T09:00:00')
+    assert names(index.query(start='2026-10-17')) == ['Alia', 'Omar']
+
+
+def test_index_rebuilds_after_log_is_replaced(data_dir):
+    fill_log()
+    index = AttendanceIndex()
+    assert index.query()['total'] == 5
+
+    os.remove(attendance.ATTENDANCE_FILE)
+    append('Omar', '2026-10-17T09:00:00')
+    assert names(index.query()) == ['Omar']
+
+
+def test_iter_records_matches_query(data_dir):
+    fill_log()
+    index = AttendanceIndex()
+
+    records = list(index.iter_records(name='ali'))
+    assert records == index.query(name='ali')['records']
+    assert list(index.iter_records(name='nobody')) == []
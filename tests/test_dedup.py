@@ -0,0 +1,79 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from utils import attendance  # noqa: E402
+from utils.dedup import AttendanceDeduper  # noqa: E402
+
+TODAY = datetime.combine(date.today(), time(8))
+YESTERDAY = TODAY - timedelta(days=1)
+
+
+def ts(when, seconds=0):
+    return (when + timedelta(seconds=seconds)).timestamp()
+
+
+def test_known_person_is_logged_once_per_day(data_dir):
+    deduper = AttendanceDeduper()
+
+    assert deduper.should_log('Ali', now=ts(TODAY))
+    assert not deduper.should_log('Ali', now=ts(TODAY, 3600))
+    assert deduper.should_log('Sara', now=ts(TODAY, 3600))
+    assert deduper.suppressed == 1
+
+
+def test_interleaved_days_keep_their_claims(data_dir):
+    deduper = AttendanceDeduper()
+
+    assert deduper.should_log('Ali', now=ts(YESTERDAY))
+    assert deduper.should_log('Ali', now=ts(TODAY))
+    assert not deduper.should_log('Ali', now=ts(YESTERDAY, 60))
+    assert not deduper.should_log('Ali', now=ts(TODAY, 60))
+
+
+def test_known_person_already_in_that_days_log(data_dir):
+    attendance.append_records([attendance.make_record('Ali', 'snap.jpg', 'Present', YESTERDAY)])
+    deduper = AttendanceDeduper()
+
+    assert not deduper.should_log('Ali', now=ts(YESTERDAY, 600))
+    assert deduper.should_log('Ali', now=ts(TODAY))
+
+
+def test_reprocessing_the_same_footage_logs_nothing_new(data_dir):
+    detections = [('Ali', ts(YESTERDAY)), ('Sara', ts(YESTERDAY, 30)), ('Ali', ts(YESTERDAY, 60))]
+
+    first = AttendanceDeduper()
+    logged = [(name, now) for name, now in detections if first.should_log(name, now=now)]
+    attendance.append_records([
+        attendance.make_record(name, 'snap.jpg', 'Present', datetime.fromtimestamp(now))
+        for name, now in logged
+    ])
+    assert [name for name, _ in logged] == ['Ali', 'Sara']
+
+    second = AttendanceDeduper()
+    assert not any(second.should_log(name, now=now) for name, now in detections)
+
+
+def test_unknown_cooldown_with_out_of_order_times(data_dir):
+    deduper = AttendanceDeduper(unknown_cooldown=5.0)
+
+    assert deduper.should_log('Unknown', now=ts(TODAY, 10))
+    assert not deduper.should_log('Unknown', now=ts(TODAY, 12))
+    # Earlier than the last record, but still within the cooldown of it.
+    assert not deduper.should_log('Unknown', now=ts(TODAY, 7))
+    assert deduper.should_log('Unknown', now=ts(TODAY, 20))
+
+
+def test_same_unknown_face_is_suppressed_while_seen(data_dir):
+    deduper = AttendanceDeduper(unknown_cooldown=5.0, unknown_window=300.0)
+    face = np.zeros(128, dtype=np.float32)
+    other = np.full(128, 0.1, dtype=np.float32)
+
+    assert deduper.should_log('Unknown', face, now=ts(TODAY))
+    assert not deduper.should_log('Unknown', face + 0.01, now=ts(TODAY, 60))
+    assert deduper.should_log('Unknown', other, now=ts(TODAY, 61))
+    # Still within the window extended by the sighting at +60 s.
+    assert not deduper.should_log('Unknown', face, now=ts(TODAY, 350))
+    assert deduper.should_log('Unknown', face, now=ts(TODAY, 1000))
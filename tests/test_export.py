@@ -0,0 +1,56 @@
+import csv
+import io
+
+import pytest
+
+from utils import export
+
+RECORDS = [
+    {'name': 'Ali', 'time_arrival': '08:00:00', 'status': 'Present',
+     'timestamp': '2026-10-17T08:00:00', 'snapshot_path': 'data/snapshots/Ali.jpg'},
+    {'name': 'Hassan, Omar', 'time_arrival': '08:05:00', 'status': 'Present',
+     'timestamp': '2026-10-17T08:05:00', 'snapshot_path': 'data/snapshots/"Omar".jpg'},
+    {'name': 'منى', 'time_arrival': '08:10:00', 'status': 'Unknown - Logged',
+     'timestamp': '2026-10-17T08:10:00'},
+]
+
+
+def test_iter_csv_writes_header_and_rows():
+    text = ''.join(export.iter_csv(RECORDS))
+
+    assert text.startswith('\ufeff')
+    rows = list(csv.reader(io.StringIO(text[1:])))
+    assert rows[0] == export.CSV_COLUMNS
+    assert rows[2][0] == 'Hassan, Omar'
+    assert rows[2][4] == 'data/snapshots/"Omar".jpg'
+    assert rows[3] == ['منى', '08:10:00', 'Unknown - Logged', '2026-10-17T08:10:00', '']
+
+
+def test_iter_csv_streams_one_row_per_chunk():
+    consumed = []
+
+    def records():
+        for rec in RECORDS:
+            consumed.append(rec['name'])
+            yield rec
+
+    chunks = export.iter_csv(records())
+    header = next(chunks)
+    assert header.startswith('\ufeffname,')
+    assert consumed == ['Ali']
+    assert next(chunks).startswith('Ali,')
+    assert len(list(chunks)) == 2
+
+
+def test_iter_csv_without_records_is_just_the_header():
+    assert ''.join(export.iter_csv([])) == '\ufeff' + ','.join(export.CSV_COLUMNS) + '\r\n'
+
+
+def test_write_pdf_stops_at_max_rows():
+    pytest.importorskip('reportlab')
+    out = io.BytesIO()
+
+    written = export.write_pdf(iter(RECORDS * 10), out, max_rows=12)
+
+    assert written == 12
+    assert out.getvalue().startswith(b'%PDF')
@@ -0,0 +1,123 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from face_recognition.index import BruteForceIndex, IVFIndex, _top_k, build_index  # noqa: E402
+from face_recognition.matcher import UNKNOWN, FaceMatcher, build_templates  # noqa: E402
+
+
+def clustered(rows, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, 128)).astype(np.float32)
+    labels = rng.integers(clusters, size=rows)
+    return (centres[labels] + 0.05 * rng.normal(size=(rows, 128))).astype(np.float32)
+
+
+def test_top_k_pads_missing_neighbours():
+    sq = np.array([[4.0, 1.0]], dtype=np.float32)
+    idx, dist = _top_k(sq, 3)
+    assert idx.tolist() == [[1, 0, -1]]
+    assert dist[0, :2].tolist() == [1.0, 2.0]
+    assert math.isinf(dist[0, 2])
+
+
+def test_empty_index_returns_padding():
+    for index in (BruteForceIndex(np.zeros((0, 128), np.float32)),
+                  IVFIndex(np.zeros((0, 128), np.float32))):
+        idx, dist = index.search(np.zeros((2, 128), np.float32), k=2)
+        assert (idx == -1).all()
+        assert np.isinf(dist).all()
+
+
+def test_ivf_recall_against_exact_search():
+    matrix = clustered(4000)
+    queries = matrix[::40] + 0.01
+    exact_idx, _ = BruteForceIndex(matrix).search(queries, k=1)
+    ivf = IVFIndex(matrix)
+    assert len(ivf.centroids) == int(np.sqrt(len(matrix)))
+    ivf_idx, _ = ivf.search(queries, k=1)
+    assert (ivf_idx[:, 0] == exact_idx[:, 0]).mean() >= 0.95
+
+
+def test_ivf_retrains_when_gallery_grows_in_small_steps():
+    matrix = clustered(21000)
+    index = build_index('ivf', matrix[:500])
+    for size in range(600, len(matrix) + 1, 100):
+        index = build_index('ivf', matrix[:size], previous=index)
+        assert index.trained_rows // 2 <= size <= index.trained_rows * 2
+    assert len(index.centroids) > 100
+
+
+def test_ivf_reuses_centroids_for_small_changes():
+    matrix = clustered(3000)
+    first = build_index('ivf', matrix[:2000])
+    second = build_index('ivf', matrix[:2100], previous=first)
+    assert np.array_equal(second.centroids, first.centroids)
+    assert second.trained_rows == 2000
+
+
+def test_ivf_save_and_load_keep_training_size(tmp_path):
+    matrix = clustered(2000)
+    index = IVFIndex(matrix)
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+
+    loaded = IVFIndex.load(path, matrix)
+    assert loaded.trained_rows == 2000
+    assert np.array_equal(loaded.search(matrix[:5])[0], index.search(matrix[:5])[0])
+    assert IVFIndex.load(path, matrix[:-1]) is None
+
+
+def test_ivf_index_saved_without_training_size_is_ignored(tmp_path):
+    matrix = clustered(100)
+    index = IVFIndex(matrix)
+    path = str(tmp_path / 'index.npz')
+    with open(path, 'wb') as f:
+        np.savez(f, centroids=index.centroids, ids=index.ids, offsets=index.offsets,
+                 n_probe=np.array(index.n_probe), fingerprint=np.array(''))
+    assert IVFIndex.load(path, matrix) is None
+
+
+def test_match_margin_to_the_next_person():
+    a = np.zeros(128, np.float32)
+    b = a.copy()
+    b[0] = 1.0
+    matcher = FaceMatcher([a, a + 0.01, b], ['Ali', 'Ali', 'Sara'])
+
+    match, = matcher.match([a])
+    assert match.name == 'Ali'
+    assert match.index == 0
+    assert match.margin == pytest.approx(1.0, abs=1e-5)
+
+
+def test_match_margin_without_another_person():
+    a = np.zeros(128, np.float32)
+    for matcher in (FaceMatcher(), FaceMatcher([a, a + 0.01], ['Ali', 'Ali'])):
+        match, = matcher.match([a])
+        assert math.isinf(match.margin)
+
+
+def test_match_beyond_tolerance_is_unknown():
+    a = np.zeros(128, np.float32)
+    far = a + 1.0
+    match, = FaceMatcher([a], ['Ali']).match([far])
+    assert match.name == UNKNOWN
+    assert match.index == 0
+
+
+def test_templates_keep_few_photos_as_they_are():
+    photos = clustered(6)
+    names = ['Ali', 'Ali', 'Sara', 'Sara', 'Sara', 'Omar']
+    matrix, template_names = build_templates(photos, names)
+    assert template_names == names
+    assert np.array_equal(matrix, photos)
+
+
+def test_templates_cap_rows_per_person_including_centroid():
+    rng = np.random.default_rng(0)
+    photos = (rng.normal(size=128) + 0.01 * rng.normal(size=(30, 128))).astype(np.float32)
+    matrix, template_names = build_templates(photos, ['Ali'] * 30, max_samples=4)
+    assert template_names == ['Ali'] * 4
+    assert np.allclose(matrix[0], photos.mean(axis=0), atol=1e-5)
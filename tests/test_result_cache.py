@@ -0,0 +1,121 @@
+import os
+import time
+
+from utils.result_cache import ResultCache
+
+
+def put(cache, data, gallery, name='Ali'):
+    cache.put(data, gallery, [(1, 2, 3, 4)], [name], b'jpeg:' + data)
+
+
+def test_hit_after_put():
+    cache = ResultCache()
+    assert cache.get(b'photo', 'g1') is None
+    put(cache, b'photo', 'g1')
+
+    result = cache.get(b'photo', 'g1')
+    assert result.locations == [(1, 2, 3, 4)]
+    assert result.names == ['Ali']
+    assert result.output == b'jpeg:photo'
+    assert cache.stats()['hits'] == 1
+
+
+def test_new_gallery_drops_old_results():
+    cache = ResultCache()
+    cache.get(b'photo', 'g1')
+    put(cache, b'photo', 'g1')
+
+    assert cache.get(b'photo', 'g2') is None
+    assert cache.get(b'photo', 'g1') is None
+
+
+def test_stale_put_is_dropped_without_reset():
+    cache = ResultCache()
+    cache.get(b'a', 'g2')
+    put(cache, b'a', 'g2')
+
+    # A job started before the gallery changed finishes late.
+    put(cache, b'b', 'g1', name='old')
+
+    assert cache.get(b'b', 'g2') is None
+    assert cache.get(b'a', 'g2').names == ['Ali']
+    assert cache.stats()['entries'] == 1
+
+
+def test_put_before_any_lookup_is_dropped():
+    cache = ResultCache()
+    put(cache, b'a', 'g1')
+    assert cache.stats()['entries'] == 0
+
+
+def test_memory_is_bounded_lru():
+    cache = ResultCache(max_entries=2)
+    cache.get(b'a', 'g')
+    put(cache, b'a', 'g')
+    put(cache, b'b', 'g')
+    cache.get(b'a', 'g')
+    put(cache, b'c', 'g')
+
+    assert cache.get(b'b', 'g') is None
+    assert cache.get(b'a', 'g') is not None
+    assert cache.get(b'c', 'g') is not None
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    cache.get(b'a', 'g1')
+    put(cache, b'a', 'g1', name='منى')
+
+    reopened = ResultCache(directory=str(tmp_path))
+    result = reopened.get(b'a', 'g1')
+    assert result.names == ['منى']
+    assert result.output == b'jpeg:a'
+
+
+def test_disk_is_bounded_lru(tmp_path):
+    cache = ResultCache(max_entries=2, directory=str(tmp_path))
+    cache.get(b'a', 'g')
+    for data in (b'a', b'b', b'c', b'd'):
+        put(cache, data, 'g')
+    assert len(os.listdir(tmp_path)) == 2
+    assert cache.stats()['files'] == 2
+
+    reopened = ResultCache(max_entries=2, directory=str(tmp_path))
+    assert reopened.get(b'a', 'g') is None
+    assert reopened.get(b'd', 'g') is not None
+
+
+def test_restart_keeps_only_newest_files_within_bound(tmp_path):
+    cache = ResultCache(max_entries=3, directory=str(tmp_path))
+    cache.get(b'a', 'g')
+    for data in (b'a', b'b', b'c'):
+        put(cache, data, 'g')
+        # Distinct modification times order the files oldest first.
+        time.sleep(0.01)
+
+    reopened = ResultCache(max_entries=2, directory=str(tmp_path))
+    assert reopened.get(b'a', 'g') is None
+    assert len(os.listdir(tmp_path)) == 2
+    assert reopened.get(b'c', 'g') is not None
+
+
+def test_new_gallery_purges_disk(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    cache.get(b'a', 'g1')
+    put(cache, b'a', 'g1')
+    assert os.listdir(tmp_path)
+
+    cache.get(b'a', 'g2')
+    assert os.listdir(tmp_path) == []
+
+
+def test_unreadable_file_is_a_miss(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    cache.get(b'a', 'g1')
+    put(cache, b'a', 'g1')
+    (path,) = [os.path.join(tmp_path, f) for f in os.listdir(tmp_path)]
+    with open(path, 'wb') as f:
+        f.write(b'not json\n')
+
+    reopened = ResultCache(directory=str(tmp_path))
+    assert reopened.get(b'a', 'g1') is None
@@ -1,13 +1,49 @@
 import os
 import json
-from datetime import datetime, date
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, date, time as dt_time
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    import msvcrt
+
+from .photos import person_name
 
 DATA_DIR = os.path.join('data')
 KNOWN_DIR = os.path.join(DATA_DIR, 'known_faces')
 UNKNOWN_DIR = os.path.join(DATA_DIR, 'unknown_faces_detected')
 SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshots')
 LOG_DIR = os.path.join(DATA_DIR, 'attendance_logs')
-ATTENDANCE_FILE = os.path.join(LOG_DIR, 'attendance_log.json')
+# Records are stored one JSON object per line so logging is a single append.
+ATTENDANCE_FILE = os.path.join(LOG_DIR, 'attendance_log.jsonl')
+# Pre-JSON Lines log (one JSON array rewritten on every entry); migrated once.
+LEGACY_ATTENDANCE_FILE = os.path.join(LOG_DIR, 'attendance_log.json')
+
+# Attendance is only logged between these times of day.
+ALLOWED_HOURS = (dt_time(6, 30), dt_time(15, 0))
+
+# Appends are serialised between threads by _write_lock and between
+# processes (the GUI and the web server share the log) by _log_file_lock.
+_write_lock = threading.Lock()
+# Migration has its own lock: it runs from readers that may already hold
+# other locks (e.g. _LogStats.lock), which appends must never wait behind.
+_migrate_lock = threading.Lock()
+_migrated = False
+
+# Names logged per day, kept in memory so was_logged_on only reads what was
+# appended (possibly by another process) since the last lookup. Only the
+# most recently used days are kept; _index_offset is how far the log has
+# been read into them.
+MAX_INDEXED_DAYS = 7
+_index_lock = threading.Lock()
+_logged_by_day = OrderedDict()
+_index_offset = 0
 
 
 def ensure_dirs():
@@ -18,109 +54,482 @@ def ensure_dirs():
     os.makedirs(LOG_DIR, exist_ok=True)
 
 
-def load_log():
-    """Return the list of attendance records from the log file."""
+def allowed_time(when=None) -> bool:
+    """Return True if attendance may be logged at ``when`` (default: now)."""
+    now = (when or datetime.now()).time()
+    return ALLOWED_HOURS[0] <= now <= ALLOWED_HOURS[1]
+
+
+def new_photo_path(name, ext):
+    """Return an unused ``KNOWN_DIR`` path for another photo of ``name``."""
+    stamp = int(time.time())
+    while True:
+        path = os.path.join(KNOWN_DIR, f"{name}_{stamp}{ext}")
+        if not os.path.exists(path):
+            return path
+        stamp += 1
+
+
+@contextmanager
+def _log_file_lock():
+    """Hold an exclusive lock on the log's lock file, shared with other processes."""
+    os.makedirs(os.path.dirname(ATTENDANCE_FILE) or '.', exist_ok=True)
+    with open(ATTENDANCE_FILE + '.lock', 'a+b') as f:
+        if msvcrt:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after ten one-second retries.
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def migrate_legacy_log():
+    """Convert the old JSON array log to JSON Lines, keeping it as a backup.
+
+    A failed migration is logged and tried again on the next call.
+    """
+    global _migrated
+    if _migrated:
+        return
+    with _migrate_lock:
+        if _migrated:
+            return
+        with _log_file_lock():
+            if os.path.exists(ATTENDANCE_FILE) or not os.path.exists(LEGACY_ATTENDANCE_FILE):
+                _migrated = True
+                return
+            try:
+                with open(LEGACY_ATTENDANCE_FILE, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+                tmp_path = ATTENDANCE_FILE + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for rec in records:
+                        f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                os.replace(tmp_path, ATTENDANCE_FILE)
+                os.replace(LEGACY_ATTENDANCE_FILE, LEGACY_ATTENDANCE_FILE + '.migrated')
+            except Exception as e:
+                logging.error("Could not migrate %s: %s", LEGACY_ATTENDANCE_FILE, e)
+                return
+            _migrated = True
+        logging.info("Migrated %d attendance records to %s", len(records), ATTENDANCE_FILE)
+
+
+def iter_log():
+    """Yield attendance records in the order they were logged."""
     ensure_dirs()
+    migrate_legacy_log()
     if not os.path.exists(ATTENDANCE_FILE):
-        return []
+        return
+    with open(ATTENDANCE_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted write; skip it.
+                continue
+
+
+def read_log_from(offset, path=None):
+    """Return ``(entries, end)`` for the complete log lines after byte ``offset``.
+
+    ``entries`` holds ``(line offset, record)`` pairs and ``end`` is where
+    the next read should start; a partly written final line is left for
+    then. Returns None if the log is now shorter than ``offset`` (it was
+    replaced), so the caller can start again from 0.
+    """
+    path = path or ATTENDANCE_FILE
+    ensure_dirs()
+    migrate_legacy_log()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size < offset:
+        return None
+    if size == offset:
+        return [], offset
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    entries = []
+    position = 0
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            break
+        line = data[position:newline]
+        start = offset + position
+        position = newline + 1
+        try:
+            entries.append((start, json.loads(line)))
+        except ValueError:
+            continue
+    return entries, offset + position
+
+
+def load_log():
+    """Return the list of attendance records from the log file."""
+    return list(iter_log())
+
+
+def _index_records(records, days):
+    # Called with _index_lock held.
+    by_prefix = {day.isoformat(): _logged_by_day[day] for day in days}
+    for rec in records:
+        try:
+            names = by_prefix.get(rec['timestamp'][:10])
+            if names is not None:
+                names.add(rec['name'])
+        except (KeyError, TypeError):
+            continue
+
+
+def _catch_up_index():
+    """Add records appended to the log since it was last read to the day index."""
+    # Called with _index_lock held.
+    global _index_offset
+    if not _logged_by_day:
+        return
     try:
-        with open(ATTENDANCE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return []
+        size = os.path.getsize(ATTENDANCE_FILE)
+    except OSError:
+        size = 0
+    if size == _index_offset:
+        return
+    result = read_log_from(_index_offset)
+    if result is None:
+        # The log was replaced; days are read again when next looked up.
+        _logged_by_day.clear()
+        _index_offset = 0
+        return
+    entries, _index_offset = result
+    _index_records([rec for _, rec in entries], list(_logged_by_day))
+
+
+def _names_logged_on(day):
+    """Return the set of names logged on ``day``, reading the log on first use."""
+    global _index_offset
+    with _index_lock:
+        _catch_up_index()
+        names = _logged_by_day.get(day)
+        if names is not None:
+            _logged_by_day.move_to_end(day)
+            return names
+        if not _logged_by_day:
+            _index_offset = 0
+        names = _logged_by_day[day] = set()
+        entries, end = read_log_from(0)
+        # Lines before _index_offset are already in the other days.
+        _index_records([rec for start, rec in entries if start < _index_offset], [day])
+        _index_records([rec for start, rec in entries if start >= _index_offset],
+                       list(_logged_by_day))
+        _index_offset = end
+        while len(_logged_by_day) > MAX_INDEXED_DAYS:
+            _logged_by_day.popitem(last=False)
+        return names
+
+
+def was_logged_on(name: str, day: date) -> bool:
+    """Check if the given person was already logged on ``day``."""
+    return name in _names_logged_on(day)
 
 
 def was_logged_today(name: str) -> bool:
     """Check if the given person was already logged today."""
-    today = date.today().isoformat()
-    for rec in load_log():
-        if rec['name'] == name and rec['timestamp'].startswith(today):
-            return True
-    return False
+    return was_logged_on(name, date.today())
 
 
-def log_entry(name: str, snapshot_path: str, status: str) -> None:
-    """Append a new attendance entry to the JSON log."""
-    ensure_dirs()
-    record = {
+def make_record(name: str, snapshot_path: str, status: str, when: datetime = None) -> dict:
+    """Build an attendance record; ``when`` defaults to now."""
+    when = when or datetime.now()
+    return {
         'name': name,
-        'timestamp': datetime.now().isoformat(),
-        'time_arrival': datetime.now().strftime('%H:%M:%S'),
+        'timestamp': when.isoformat(),
+        'time_arrival': when.strftime('%H:%M:%S'),
         'status': status,
         'snapshot_path': snapshot_path,
     }
-    data = load_log()
-    data.append(record)
-    with open(ATTENDANCE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def append_records(records) -> None:
+    """Append records to the log with a single write."""
+    global _index_offset
+    if not records:
+        return
+    ensure_dirs()
+    migrate_legacy_log()
+    data = ''.join(json.dumps(rec, ensure_ascii=False) + '\n' for rec in records).encode('utf-8')
+    with _write_lock, _log_file_lock():
+        with open(ATTENDANCE_FILE, 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            start = f.tell()
+            if start:
+                f.seek(start - 1)
+                if f.read(1) != b'\n':
+                    # A write was interrupted mid-line; end that line so the
+                    # new records are not glued to it.
+                    data = b'\n' + data
+            f.write(data)
+            end = f.tell()
+    # Outside _write_lock: _stats.lock is held while reading the log, and
+    # appended() ignores records that arrive out of order.
+    _stats.appended(records, start, end)
+    with _index_lock:
+        # Records written after ones not yet read are picked up by the next
+        # _catch_up_index instead.
+        if _logged_by_day and _index_offset == start:
+            _index_records(records, list(_logged_by_day))
+            _index_offset = end
+
+
+def log_entry(name: str, snapshot_path: str, status: str) -> None:
+    """Append a new attendance entry to the log."""
+    append_records([make_record(name, snapshot_path, status)])
+
+
+class _LogStats:
+    """Dashboard aggregates kept up to date as records are appended.
+
+    Records appended by this process are counted as they are written. The
+    log is only read past ``offset``, the end of what has been counted, which
+    picks up records written by another process (the GUI and the web server
+    share the file). The first call reads the whole log once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enrolled_mtime = None
+        self.enrolled = 0
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.day = None
+        self.present_today = set()
+        self.today_records = 0
+        self.unknown_today = 0
+        self.present_counts = {}
+        self.frequent = ''
+
+    def appended(self, records, start, end):
+        """Count records this process wrote to bytes ``start:end`` of the log."""
+        with self.lock:
+            if self.offset != start:
+                # Something was written before them that is not counted yet;
+                # the next catch_up reads both from the file.
+                return
+            for rec in records:
+                self._add(rec)
+            self.offset = end
+
+    def snapshot(self):
+        with self.lock:
+            self._catch_up()
+            self._roll_day(date.today())
+            self._count_enrolled()
+            return {
+                'total_students': self.enrolled,
+                'today_count': len(self.present_today),
+                'frequent': self.frequent,
+                'present': self.today_records - self.unknown_today,
+                'unknown': self.unknown_today,
+            }
+
+    def _roll_day(self, day):
+        if self.day != day:
+            self.day = day
+            self.present_today = set()
+            self.today_records = 0
+            self.unknown_today = 0
+
+    def _add(self, rec):
+        self._roll_day(date.today())
+        if rec['status'] == 'Present':
+            count = self.present_counts.get(rec['name'], 0) + 1
+            self.present_counts[rec['name']] = count
+            if count > self.present_counts.get(self.frequent, 0):
+                self.frequent = rec['name']
+        if not rec['timestamp'].startswith(self.day.isoformat()):
+            return
+        self.today_records += 1
+        if rec['status'] == 'Present':
+            self.present_today.add(rec['name'])
+        elif rec['status'].startswith('Unknown'):
+            self.unknown_today += 1
+
+    def _catch_up(self):
+        result = read_log_from(self.offset)
+        if result is None:
+            # The log was replaced; count it again from the start.
+            self._reset()
+            result = read_log_from(0)
+        entries, self.offset = result
+        for _, rec in entries:
+            try:
+                self._add(rec)
+            except (KeyError, TypeError, AttributeError):
+                continue
+
+    def _count_enrolled(self):
+        # Adding, removing or renaming a photo changes the directory mtime.
+        try:
+            mtime = os.stat(KNOWN_DIR).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.enrolled_mtime:
+            return
+        self.enrolled_mtime = mtime
+        self.enrolled = len({person_name(f) for f in os.listdir(KNOWN_DIR)
+                             if f.lower().endswith(('.jpg', '.jpeg', '.png'))})
+
+
+_stats = _LogStats()
 
 
 def get_stats():
     """Return basic statistics for the dashboard."""
-    records = load_log()
+    return _stats.snapshot()
+
+
+DASHBOARD_TEMPLATE = os.path.join('templates', 'attendance_dashboard.html')
+DASHBOARD_FILE = os.path.join('frontend', 'public', 'attendance_dashboard.html')
+# Placeholders in the dashboard template.
+_DATE_MARK = '2025-06-09'
+_TIME_MARK = '00:47:05'
+
+_template_lock = threading.Lock()
+_template_cache = None
+
+
+def _dashboard_template():
+    """Return the dashboard template split as ``(before_time, before_rows, after_rows)``.
+
+    The template is read once and again only when the file changes.
+    """
+    global _template_cache
+    mtime = os.stat(DASHBOARD_TEMPLATE).st_mtime_ns
+    with _template_lock:
+        if _template_cache is None or _template_cache[0] != mtime:
+            with open(DASHBOARD_TEMPLATE, 'r', encoding='utf-8', newline='') as f:
+                template = f.read()
+            head, _, tail = template.partition('<tbody>')
+            before_time, _, before_rows = head.partition(_TIME_MARK)
+            _template_cache = (mtime, (before_time, before_rows + '<tbody>', tail))
+        return _template_cache[1]
+
+
+def _dashboard_row(i, rec):
+    snap_rel = os.path.relpath(rec['snapshot_path'], 'frontend/public')
+    return (
+        f'\n<tr>'
+        f'<td>{i}</td>'
+        f'<td><a href="{snap_rel}" class="snapshot-link">مشاهدة</a></td>'
+        f'<td>{rec["name"]}</td>'
+        f'<td>{rec["time_arrival"]}</td>'
+        f'<td>{rec["status"]}</td>'
+        f'<td data-timestamp="{rec["timestamp"]}">{rec["timestamp"]}</td>'
+        f'</tr>'
+    )
+
+
+def render_dashboard_html(records) -> str:
+    """Return the attendance dashboard page with ``records`` as table rows."""
+    before_time, before_rows, tail = _dashboard_template()
     today = date.today().isoformat()
-    today_recs = [r for r in records if r['timestamp'].startswith(today)]
+    return (before_time.replace(_DATE_MARK, today)
+            + datetime.now().strftime('%H:%M:%S')
+            + before_rows.replace(_DATE_MARK, today)
+            + ''.join(_dashboard_row(i, rec) for i, rec in enumerate(records, 1))
+            + tail.replace(_DATE_MARK, today))
 
-    known = []
-    for fname in os.listdir(KNOWN_DIR):
-        if fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-            name = os.path.splitext(fname)[0].split('_')[0]
-            known.append(name)
-    total_students = len(set(known))
 
-    present_names = set(r['name'] for r in today_recs if r['status'] == 'Present')
-    today_count = len(present_names)
+class DashboardFile:
+    """The static dashboard page, updated in place as records are logged.
 
-    unknown_count = sum(1 for r in today_recs if r['status'].startswith('Unknown'))
-    present_count = len(today_recs) - unknown_count
+    The page is written in full once a day (or when it is missing); after
+    that :meth:`refresh` reads only the log lines appended since the last
+    call, inserts their rows before the end of the table and overwrites the
+    fixed-width "last updated" time, so a refresh costs the new records
+    rather than the whole history.
+    """
 
-    freq = {}
-    for r in records:
-        if r['status'] == 'Present':
-            freq[r['name']] = freq.get(r['name'], 0) + 1
-    frequent = max(freq.items(), key=lambda x: x[1])[0] if freq else ''
+    def __init__(self, path=DASHBOARD_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = None
+        self._offset = 0
+        self._rows = 0
+        self._time_pos = 0
+        self._tail = b''
+        self._size = -1
 
-    return {
-        'total_students': total_students,
-        'today_count': today_count,
-        'frequent': frequent,
-        'present': present_count,
-        'unknown': unknown_count,
-    }
+    def refresh(self) -> str:
+        """Bring the page up to date with the log and return its path."""
+        with self._lock:
+            today = date.today()
+            result = read_log_from(self._offset) if self._day == today else None
+            try:
+                # Anything else writing the file means our offsets are stale.
+                unchanged = os.path.getsize(self.path) == self._size
+            except OSError:
+                unchanged = False
+            if result is None or not unchanged:
+                self._rebuild(today)
+            else:
+                entries, self._offset = result
+                prefix = today.isoformat()
+                self._append([rec for _, rec in entries if rec.get('timestamp', '').startswith(prefix)])
+        return self.path
+
+    def _rebuild(self, today):
+        entries, self._offset = read_log_from(0)
+        prefix = today.isoformat()
+        records = [rec for _, rec in entries if rec.get('timestamp', '').startswith(prefix)]
+        before_time, _, tail = _dashboard_template()
+        self._day = today
+        self._rows = len(records)
+        self._time_pos = len(before_time.replace(_DATE_MARK, prefix).encode('utf-8'))
+        self._tail = tail.replace(_DATE_MARK, prefix).encode('utf-8')
+        html = render_dashboard_html(records).encode('utf-8')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(html)
+        os.replace(tmp_path, self.path)
+        self._size = len(html)
+
+    def _append(self, records):
+        rows = ''.join(_dashboard_row(self._rows + i, rec) for i, rec in enumerate(records, 1))
+        with open(self.path, 'r+b') as f:
+            if records:
+                f.seek(-len(self._tail), os.SEEK_END)
+                f.write(rows.encode('utf-8') + self._tail)
+                self._size = f.tell()
+                self._rows += len(records)
+            f.seek(self._time_pos)
+            f.write(datetime.now().strftime('%H:%M:%S').encode('ascii'))
+
+
+_dashboard = DashboardFile()
 
 
 def generate_dashboard_html() -> str:
-    """Generate the dashboard HTML file for today's records and return its path."""
-    ensure_dirs()
-    records = [r for r in load_log() if r['timestamp'].startswith(date.today().isoformat())]
-    rows = []
-    for i, rec in enumerate(records, 1):
-        snap_rel = os.path.relpath(rec['snapshot_path'], 'frontend/public')
-        row = (
-            f'<tr>'
-            f'<td>{i}</td>'
-            f'<td><a href="{snap_rel}" class="snapshot-link">مشاهدة</a></td>'
-            f'<td>{rec["name"]}</td>'
-            f'<td>{rec["time_arrival"]}</td>'
-            f'<td>{rec["status"]}</td>'
-            f'<td data-timestamp="{rec["timestamp"]}">{rec["timestamp"]}</td>'
-            f'</tr>'
-        )
-        rows.append(row)
-    if not rows:
-        rows.append('<tr><td colspan="6" class="no-records">لا توجد سجلات حضور لهذا اليوم بعد.</td></tr>')
-
-    with open(os.path.join('templates', 'attendance_dashboard.html'), 'r', encoding='utf-8') as f:
-        template = f.read()
-
-    html = template
-    html = html.replace('2025-06-09', date.today().isoformat())
-    html = html.replace('00:47:05', datetime.now().strftime('%H:%M:%S'))
-    html = html.replace('<tbody>', '<tbody>' + '\n'.join(rows))
-
-    out_dir = os.path.join('frontend', 'public')
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, 'attendance_dashboard.html')
-    with open(out_path, 'w', encoding='utf-8') as f:
-        f.write(html)
-    return out_path
+    """Bring the dashboard HTML file up to date for today and return its path."""
+    return _dashboard.refresh()
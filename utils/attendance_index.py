@@ -0,0 +1,133 @@
+import sys
+import json
+import bisect
+import threading
+
+from . import attendance
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class AttendanceIndex:
+    """Date, name and status indexes over the JSON Lines attendance log.
+
+    Only the timestamp, name, status and byte offset of each record are held
+    in memory; a page of results is read back from the log by offset. Like
+    :func:`attendance.get_stats`, each query first reads just the lines
+    appended since the previous one, so the index follows records written by
+    any process.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or attendance.ATTENDANCE_FILE
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        # One (timestamp, name, status, offset) tuple per record, in log order.
+        self.rows = []
+        self.by_date = {}
+        self.dates = []
+        self.by_name = {}
+        self.by_status = {}
+
+    def query(self, start=None, end=None, name=None, status=None, page=1,
+              per_page=DEFAULT_PAGE_SIZE):
+        """Return one page of matching records, oldest first, with counts.
+
+        ``start`` and ``end`` are inclusive ISO dates, ``name`` matches any
+        part of a name (case-insensitive) and ``status`` is ``'Present'`` or
+        an exact status.
+        """
+        per_page = max(1, min(int(per_page), MAX_PAGE_SIZE))
+        page = max(1, int(page))
+        with self._lock:
+            self._catch_up()
+            ids = self._match(start, end, name, status)
+            ids.sort(key=lambda i: (self.rows[i][0], i))
+            unknown = sum(1 for i in ids if self.rows[i][2].startswith('Unknown'))
+            offsets = [self.rows[i][3] for i in ids[(page - 1) * per_page:page * per_page]]
+        return {
+            'total': len(ids),
+            'page': page,
+            'per_page': per_page,
+            'pages': max(1, -(-len(ids) // per_page)),
+            'counts': {'present': len(ids) - unknown, 'unknown': unknown},
+            'records': self._read(offsets),
+        }
+
+    def iter_records(self, start=None, end=None, name=None, status=None):
+        """Yield every matching record, oldest first, reading one at a time."""
+        with self._lock:
+            self._catch_up()
+            ids = self._match(start, end, name, status)
+            ids.sort(key=lambda i: (self.rows[i][0], i))
+            offsets = [self.rows[i][3] for i in ids]
+        if not offsets:
+            return
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def _match(self, start, end, name, status):
+        # Called with the lock held. Each filter gives a posting list; the
+        # shortest is scanned and checked against the others.
+        postings = []
+        if start or end:
+            lo = bisect.bisect_left(self.dates, start) if start else 0
+            hi = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+            postings.append([i for day in self.dates[lo:hi] for i in self.by_date[day]])
+        if name:
+            needle = name.lower()
+            postings.append([i for key, ids in self.by_name.items() if needle in key.lower() for i in ids])
+        if status:
+            if status == 'Present':
+                keys = [key for key in self.by_status if key.startswith('Present')]
+            else:
+                keys = [status] if status in self.by_status else []
+            postings.append([i for key in keys for i in self.by_status[key]])
+        if not postings:
+            return list(range(len(self.rows)))
+        postings.sort(key=len)
+        others = [set(p) for p in postings[1:]]
+        return [i for i in postings[0] if all(i in other for other in others)]
+
+    def _read(self, offsets):
+        records = []
+        if not offsets:
+            return records
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def _catch_up(self):
+        # Called with the lock held.
+        result = attendance.read_log_from(self.offset, self.path)
+        if result is None:
+            # The log was replaced; index it again from the start.
+            self._reset()
+            result = attendance.read_log_from(0, self.path)
+        entries, self.offset = result
+        for offset, rec in entries:
+            try:
+                self._add(rec['timestamp'], rec['name'], rec['status'], offset)
+            except (KeyError, TypeError):
+                continue
+
+    def _add(self, timestamp, name, status, offset):
+        row = len(self.rows)
+        name = sys.intern(name)
+        status = sys.intern(status)
+        self.rows.append((timestamp, name, status, offset))
+        day = timestamp[:10]
+        if day not in self.by_date:
+            self.by_date[day] = []
+            bisect.insort(self.dates, day)
+        self.by_date[day].append(row)
+        self.by_name.setdefault(name, []).append(row)
+        self.by_status.setdefault(status, []).append(row)
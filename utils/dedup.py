@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from . import attendance
+
+UNKNOWN_NAME = 'Unknown'
+# Minimum seconds between any two unknown-face records.
+UNKNOWN_COOLDOWN = 5.0
+# How long an unknown face is remembered; it is not logged again while it
+# keeps being seen within this window.
+UNKNOWN_WINDOW = 300.0
+# Encodings closer than this are treated as the same unknown person.
+UNKNOWN_TOLERANCE = 0.5
+# Days whose claims are kept; older days fall back to the log alone.
+MAX_DAYS = 7
+
+
+class _DayState:
+    """What has been claimed on one calendar day."""
+
+    def __init__(self):
+        self.claimed = set()
+        self.last_unknown = None
+        self.unknown_seen = []
+        self.unknown_encodings = np.zeros((0, 128), dtype=np.float32)
+
+
+class AttendanceDeduper:
+    """Decide which detections are worth a snapshot and an attendance record.
+
+    Known people are logged once per day, checked against both this
+    deduper's claims and the log for that day. Unknown faces are rate
+    limited by ``unknown_cooldown`` and, when an encoding is given,
+    suppressed while a similar unknown face was seen within
+    ``unknown_window`` seconds.
+
+    State is kept per calendar day of the detection time, so recorded
+    footage from several days may be processed in any order; times within
+    a day need not arrive in order either.
+    """
+
+    def __init__(self, unknown_cooldown=UNKNOWN_COOLDOWN, unknown_window=UNKNOWN_WINDOW,
+                 unknown_tolerance=UNKNOWN_TOLERANCE, max_days=MAX_DAYS):
+        self.unknown_cooldown = unknown_cooldown
+        self.unknown_window = unknown_window
+        self.unknown_tolerance = unknown_tolerance
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days = OrderedDict()
+        self.suppressed = 0
+
+    def should_log(self, name, encoding=None, now=None):
+        """Return True if this detection should be logged, and claim it.
+
+        ``now`` is the detection time as a POSIX timestamp (default: now);
+        recorded footage passes the time the frame was captured.
+        """
+        now = time.time() if now is None else now
+        day = date.fromtimestamp(now)
+        with self._lock:
+            state = self._state(day)
+            if name == UNKNOWN_NAME:
+                ok = self._check_unknown(state, encoding, now)
+            else:
+                ok = self._check_known(state, name, day)
+            if not ok:
+                self.suppressed += 1
+            return ok
+
+    def _state(self, day):
+        state = self._days.get(day)
+        if state is None:
+            state = self._days[day] = _DayState()
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        else:
+            self._days.move_to_end(day)
+        return state
+
+    def _check_known(self, state, name, day):
+        if name in state.claimed:
+            return False
+        state.claimed.add(name)
+        return not attendance.was_logged_on(name, day)
+
+    def _check_unknown(self, state, encoding, now):
+        # Distances in time are absolute, so out-of-order detections are
+        # compared the same way as chronological ones.
+        keep = [i for i, seen in enumerate(state.unknown_seen) if abs(now - seen) < self.unknown_window]
+        if len(keep) != len(state.unknown_seen):
+            state.unknown_seen = [state.unknown_seen[i] for i in keep]
+            state.unknown_encodings = state.unknown_encodings[keep]
+        if encoding is not None and len(state.unknown_seen):
+            query = np.asarray(encoding, dtype=np.float32)
+            dist = np.linalg.norm(state.unknown_encodings - query, axis=1)
+            nearest = int(np.argmin(dist))
+            if dist[nearest] <= self.unknown_tolerance:
+                # Still around: extend the window instead of logging again.
+                state.unknown_seen[nearest] = max(state.unknown_seen[nearest], now)
+                return False
+        if state.last_unknown is not None and abs(now - state.last_unknown) < self.unknown_cooldown:
+            return False
+        state.last_unknown = now
+        if encoding is not None:
+            state.unknown_seen.append(now)
+            state.unknown_encodings = np.vstack(
+                [state.unknown_encodings, np.asarray(encoding, dtype=np.float32)[None, :]]
+            )
+        return True
@@ -0,0 +1,124 @@
+import os
+import logging
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+class EncodingCache:
+    """Persistent store of face encodings keyed by image path, size and mtime.
+
+    Images without a detectable face are remembered too, so they are not
+    re-encoded on every start. The store is a single ``.npz`` file that is
+    replaced atomically on :meth:`save`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                rows = zip(data['paths'], data['sizes'], data['mtimes'],
+                           data['has_face'], data['encodings'])
+                for path, size, mtime, has_face, encoding in rows:
+                    self.entries[str(path)] = (
+                        int(size), int(mtime), encoding if has_face else None
+                    )
+        except Exception as e:
+            logging.warning("Ignoring unreadable encoding cache %s: %s", self.path, e)
+            self.entries = {}
+
+    def lookup(self, path):
+        """Return ``(hit, encoding)``; ``encoding`` is None for faceless images."""
+        entry = self.entries.get(self._key(path))
+        if entry is None:
+            return False, None
+        try:
+            signature = self._signature(path)
+        except OSError:
+            return False, None
+        if entry[:2] != signature:
+            return False, None
+        return True, entry[2]
+
+    def store(self, path, encoding):
+        """Remember ``encoding`` (or None) for the current version of ``path``."""
+        try:
+            size, mtime = self._signature(path)
+        except OSError:
+            return
+        self.entries[self._key(path)] = (size, mtime, encoding)
+        self.dirty = True
+
+    def discard(self, path):
+        if self.entries.pop(self._key(path), None) is not None:
+            self.dirty = True
+
+    def prune(self, directory, keep_paths):
+        """Drop entries under ``directory`` whose image is not in ``keep_paths``."""
+        directory = self._key(directory)
+        keep = {self._key(p) for p in keep_paths}
+        stale = [p for p in self.entries
+                 if os.path.dirname(p) == directory and p not in keep]
+        for p in stale:
+            del self.entries[p]
+        if stale:
+            self.dirty = True
+
+    def snapshot(self):
+        """Return a copy of the entries for :meth:`save` and mark them saved.
+
+        Lets a caller that guards the cache with a lock copy it under the
+        lock and write it after releasing it.
+        """
+        self.dirty = False
+        return dict(self.entries)
+
+    def save(self, entries=None):
+        """Write the cache, or the ``entries`` taken by :meth:`snapshot`."""
+        if entries is None:
+            if not self.dirty:
+                return
+            entries = self.snapshot()
+        paths = list(entries)
+        encodings = np.zeros((len(paths), ENCODING_SIZE))
+        has_face = np.zeros(len(paths), dtype=bool)
+        for i, p in enumerate(paths):
+            encoding = entries[p][2]
+            if encoding is not None:
+                encodings[i] = encoding
+                has_face[i] = True
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    paths=np.array(paths, dtype=str),
+                    sizes=np.array([entries[p][0] for p in paths], dtype=np.int64),
+                    mtimes=np.array([entries[p][1] for p in paths], dtype=np.int64),
+                    has_face=has_face,
+                    encodings=encodings,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.error("Could not write encoding cache %s: %s", self.path, e)
+            self.dirty = True
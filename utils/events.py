@@ -0,0 +1,62 @@
+import json
+import queue
+import logging
+import threading
+
+MAX_QUEUE = 100
+# Seconds between keep-alive comments, so proxies and browsers keep idle
+# connections open and closed clients are noticed.
+KEEPALIVE = 15.0
+
+
+class EventBroadcaster:
+    """Send server-sent events to every connected client.
+
+    Each client has its own bounded queue, filled by :meth:`publish` and
+    drained by the generator from :meth:`stream`, which a Flask view returns
+    as a ``text/event-stream`` response. A client that stops reading loses
+    events instead of blocking the publisher.
+    """
+
+    def __init__(self, max_queue=MAX_QUEUE, keepalive=KEEPALIVE):
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._clients = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def publish(self, event, data):
+        """Queue ``data`` (JSON-serialisable) as ``event`` for every client."""
+        message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                self.dropped += 1
+        self.published += 1
+
+    def stream(self):
+        """Yield SSE messages for one client until it disconnects."""
+        client = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._clients.add(client)
+        logging.info("Event client connected (%d total)", len(self._clients))
+        try:
+            # Tell the browser how soon to reconnect if the stream drops.
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield client.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._clients.discard(client)
+            logging.info("Event client disconnected (%d total)", len(self._clients))
@@ -0,0 +1,121 @@
+import io
+import os
+import csv
+from datetime import datetime
+
+CSV_COLUMNS = ['name', 'time_arrival', 'status', 'timestamp', 'snapshot_path']
+# Unicode fonts tried for PDF reports, so Arabic and other non-Latin names
+# are not drawn as empty boxes; Helvetica is used when none is installed.
+PDF_FONTS = [
+    r'C:\Windows\Fonts\arial.ttf',
+    r'C:\Windows\Fonts\tahoma.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+]
+PDF_COLUMNS = [('#', 40), ('Name', 170), ('Check-in', 70), ('Status', 120), ('Timestamp', 200)]
+# reportlab keeps every page of a document in memory until it is saved, so
+# PDF reports stop after this many rows (about 1000 pages); the CSV export
+# streams any number of rows.
+MAX_PDF_ROWS = 30000
+
+
+def iter_csv(records):
+    """Yield CSV text for ``records`` one row at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The byte order mark makes Excel read the file as UTF-8.
+    buffer.write('\ufeff')
+    writer.writerow(CSV_COLUMNS)
+    for rec in records:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([rec.get(column, '') for column in CSV_COLUMNS])
+    yield buffer.getvalue()
+
+
+def _pdf_font():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    for path in PDF_FONTS:
+        if os.path.exists(path):
+            try:
+                pdfmetrics.registerFont(TTFont('ReportFont', path))
+                return 'ReportFont'
+            except Exception:
+                continue
+    return 'Helvetica'
+
+
+def write_pdf(records, out, title='Attendance Report', max_rows=MAX_PDF_ROWS):
+    """Write a PDF table of ``records`` to the file object ``out``.
+
+    Rows are drawn straight onto compressed pages as records are read,
+    instead of first building a table of every row. The finished pages
+    are still held in memory until the document is saved, so at most
+    ``max_rows`` records are written and a note says the report was cut
+    short. Returns the number of records written. Needs ``reportlab``.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    font = _pdf_font()
+    width, height = landscape(A4)
+    margin = 36
+    row_height = 16
+    pdf = canvas.Canvas(out, pagesize=(width, height), pageCompression=1)
+    pdf.setTitle(title)
+    generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    page = 0
+
+    def start_page():
+        pdf.setFont(font, 14)
+        pdf.drawString(margin, height - margin, title)
+        pdf.setFont(font, 8)
+        pdf.drawRightString(width - margin, height - margin, f"Generated {generated}  -  page {page}")
+        y = height - margin - 28
+        x = margin
+        pdf.setFont(font, 10)
+        for label, column_width in PDF_COLUMNS:
+            pdf.drawString(x, y, label)
+            x += column_width
+        pdf.line(margin, y - 4, width - margin, y - 4)
+        pdf.setFont(font, 9)
+        return y - row_height
+
+    count = 0
+    y = 0
+    truncated = False
+    for rec in records:
+        if max_rows is not None and count >= max_rows:
+            truncated = True
+            break
+        if count == 0 or y < margin:
+            if count:
+                pdf.showPage()
+            page += 1
+            y = start_page()
+        count += 1
+        x = margin
+        values = [str(count), rec.get('name', ''), rec.get('time_arrival', ''),
+                  rec.get('status', ''), rec.get('timestamp', '')]
+        for value, (_, column_width) in zip(values, PDF_COLUMNS):
+            pdf.drawString(x, y, str(value)[:60])
+            x += column_width
+        y -= row_height
+    if count == 0:
+        page += 1
+        y = start_page()
+        pdf.drawString(margin, y, 'No records.')
+        y -= row_height
+    pdf.setFont(font, 10)
+    footer = f"Total records: {count}"
+    if truncated:
+        footer = (f"Only the first {count} records are included; "
+                  f"use the CSV export for the complete list.")
+    pdf.drawString(margin, max(y - 8, margin / 2), footer)
+    pdf.showPage()
+    pdf.save()
+    return count
@@ -0,0 +1,12 @@
+import os
+
+
+def person_name(filename):
+    """Return the person a known-face photo belongs to.
+
+    Photos are saved as ``<name>_<unix time><ext>``; the numeric suffix is
+    dropped so every photo of a person maps to the same name.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    base, sep, suffix = stem.rpartition('_')
+    return base if sep and base and suffix.isdigit() else stem
@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+MAX_ENTRIES = 128
+FILE_EXTENSION = '.result'
+
+# ``locations`` are (top, right, bottom, left) boxes, ``names`` one label per
+# box and ``output`` the encoded processed image.
+CachedResult = namedtuple('CachedResult', ['locations', 'names', 'output'])
+
+
+class ResultCache:
+    """LRU cache of recognition results keyed by image content and gallery.
+
+    Lookups hash the uploaded bytes, so the same photo uploaded again under
+    any name is answered without detection or encoding. Entries are tied to
+    the gallery key they were computed with; the first lookup with a new key
+    drops everything older, in memory and in ``directory`` (optional, one
+    file per entry, evicted by the same LRU bound). A result stored against
+    any other gallery than the current one is discarded.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Entry files of the current gallery, least recently used first.
+        self._files = OrderedDict()
+        self._gallery = None
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def image_key(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, data, gallery):
+        """Return the :class:`CachedResult` for these image bytes, or None."""
+        key = self.image_key(data)
+        with self._lock:
+            self._set_gallery(gallery)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            in_file = key in self._files
+            if in_file:
+                self._files.move_to_end(key)
+        if result is None and in_file:
+            result = self._load(self._path(gallery, key))
+            if result is not None:
+                with self._lock:
+                    if self._gallery == gallery:
+                        self._remember(key, result)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, data, gallery, locations, names, output):
+        """Store a result computed for ``data`` against ``gallery``.
+
+        The result is dropped when ``gallery`` is no longer the current one,
+        e.g. for a job that finished after the known faces changed.
+        """
+        key = self.image_key(data)
+        result = CachedResult([tuple(int(v) for v in loc) for loc in locations], list(names), bytes(output))
+        with self._lock:
+            if self._gallery != gallery:
+                return
+            self._remember(key, result)
+        if not self.directory:
+            return
+        path = self._path(gallery, key)
+        if not self._save(path, result):
+            return
+        with self._lock:
+            if self._gallery == gallery:
+                self._files[key] = path
+                self._files.move_to_end(key)
+                evicted = []
+                while len(self._files) > self.max_entries:
+                    evicted.append(self._files.popitem(last=False)[1])
+            else:
+                # The gallery changed while the file was written.
+                evicted = [path]
+        for path in evicted:
+            self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._files.clear()
+            self._gallery = None
+            if self.directory:
+                self._purge(keep=None)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'files': len(self._files),
+                'hits': self.hits, 'misses': self.misses}
+
+    def _remember(self, key, result):
+        # Called with the lock held.
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _set_gallery(self, gallery):
+        # Called with the lock held.
+        if gallery == self._gallery:
+            return
+        self._entries.clear()
+        self._files.clear()
+        self._gallery = gallery
+        if self.directory:
+            self._purge(keep=gallery)
+
+    def _path(self, gallery, key):
+        return os.path.join(self.directory, f"{gallery[:16]}_{key}{FILE_EXTENSION}")
+
+    def _purge(self, keep):
+        # Called with the lock held. Removes every file except the entries
+        # of ``keep``, which are indexed oldest first up to the LRU bound.
+        prefix = f"{keep[:16]}_" if keep else None
+        kept = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if prefix and name.startswith(prefix):
+                if name.endswith('.tmp'):
+                    # Possibly being written by a concurrent put.
+                    continue
+                if name.endswith(FILE_EXTENSION):
+                    key = name[len(prefix):-len(FILE_EXTENSION)]
+                    try:
+                        kept.append((entry.stat().st_mtime_ns, key, entry.path))
+                        continue
+                    except OSError:
+                        pass
+            if entry.is_file():
+                self._remove(entry.path)
+        kept.sort()
+        excess = max(len(kept) - self.max_entries, 0)
+        for _, _, path in kept[:excess]:
+            self._remove(path)
+        for _, key, path in kept[excess:]:
+            self._files[key] = path
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _load(path):
+        # One JSON line with the boxes and names, then the encoded image.
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                output = f.read()
+            return CachedResult([tuple(int(v) for v in loc) for loc in header['locations']],
+                                [str(n) for n in header['names']], output)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning("Ignoring unreadable result cache entry %s: %s", path, e)
+            return None
+
+    @staticmethod
+    def _save(path, result):
+        header = json.dumps({'locations': result.locations, 'names': result.names}, ensure_ascii=False)
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+                f.write(result.output)
+            os.replace(tmp, path)
+            return True
+        except OSError as e:
+            logging.error("Could not write result cache entry %s: %s", path, e)
+            return False
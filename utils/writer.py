@@ -0,0 +1,125 @@
+import os
+import queue
+import logging
+import threading
+from datetime import datetime
+
+import cv2
+
+from . import attendance
+
+MAX_QUEUE = 256
+MAX_BATCH = 32
+
+_STOP = object()
+
+
+class AttendanceWriter:
+    """Write face snapshots and attendance records on a background thread.
+
+    The capture loop only enqueues a copy of the face crop; JPEG encoding,
+    the file write and the log append happen here. Records queued together
+    are appended to the log in one write. When the queue is full new items
+    are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, max_queue=MAX_QUEUE, max_batch=MAX_BATCH, on_flush=None):
+        self.max_batch = max_batch
+        self.on_flush = on_flush
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, name, crop, folder, status, when=None, block=False):
+        """Queue a snapshot and record; return the snapshot path or None if dropped.
+
+        With ``block=True`` (offline processing) the caller waits for room in
+        the queue instead of dropping the item.
+        """
+        if self._closed:
+            return None
+        when = when or datetime.now()
+        path = os.path.join(folder, f"{name}_{when.strftime('%Y%m%d_%H%M%S')}.jpg")
+        try:
+            self._queue.put((crop.copy(), path, attendance.make_record(name, path, status, when)),
+                            block=block)
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("Attendance writer queue full; dropped record for %s", name)
+            return None
+        self.submitted += 1
+        return path
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """Write what is queued, then stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in batch)
+            items = [item for item in batch if item is not _STOP]
+            try:
+                self._write(items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, items):
+        records = []
+        for crop, path, record in items:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if not cv2.imwrite(path, crop):
+                    raise OSError("imwrite returned False")
+            except Exception as e:
+                self.failed += 1
+                logging.error("Could not write snapshot %s: %s", path, e)
+            records.append(record)
+        if not records:
+            return
+        try:
+            attendance.append_records(records)
+            self.written += len(records)
+        except Exception as e:
+            self.failed += len(records)
+            logging.error("Could not append %d attendance records: %s", len(records), e)
+            return
+        if self.on_flush:
+            try:
+                self.on_flush(records)
+            except Exception as e:
+                logging.error("Attendance writer callback failed: %s", e)
@@ -0,0 +1,306 @@
+import os
+import time
+import atexit
+import tempfile
+from flask import Flask, render_template, render_template_string, Response, request, redirect, url_for, session, send_from_directory, send_file, jsonify, stream_with_context, abort
+from werkzeug.utils import secure_filename
+from cv2_enumerate_cameras import enumerate_cameras
+
+from face_recognition import face_utils
+from face_recognition.gallery import FaceGallery
+from face_recognition.motion import MotionGate
+from face_recognition.scheduler import FrameScheduler
+from face_recognition.stream import CameraStream
+from face_recognition.tracker import TrackingRecognizer
+from utils import attendance, export
+from utils.attendance_index import AttendanceIndex
+from utils.dedup import AttendanceDeduper
+from utils.events import EventBroadcaster
+from utils.writer import AttendanceWriter
+
+# Hardcoded admin password
+ADMIN_PASSWORD = "admin123"
+
+app = Flask(__name__, static_folder='static')
+app.secret_key = 'change_this'
+
+# Search structure for the known-face gallery: 'exact' or 'ivf' for very
+# large (whole-school) galleries.
+GALLERY_INDEX = 'exact'
+
+# Global face data
+gallery = FaceGallery(attendance.KNOWN_DIR, index=GALLERY_INDEX, index_file=face_utils.INDEX_FILE)
+gallery.load()
+recognizer = TrackingRecognizer()
+scheduler = FrameScheduler()
+motion = MotionGate()
+last_faces = ([], [])
+deduper = AttendanceDeduper()
+events = EventBroadcaster()
+
+
+def publish_records(records):
+    """Push newly written attendance records and the updated stats to dashboards."""
+    events.publish('attendance', {
+        'records': [{k: r[k] for k in ('name', 'status', 'time_arrival', 'timestamp')} for r in records],
+        'stats': attendance.get_stats(),
+    })
+
+
+writer = AttendanceWriter(on_flush=publish_records)
+atexit.register(writer.close)
+last_unknown_alert = 0
+last_alert_pushed = 0
+# Unknown-face alerts are pushed at most this often while a face stays in view.
+ALERT_REPEAT = 2.0
+attendance_index = AttendanceIndex()
+
+def get_camera_list():
+    cams = list(enumerate_cameras())
+    return cams
+
+
+@app.before_request
+def require_login():
+    if request.endpoint not in ('login', 'do_login', 'processed_file') and not session.get('logged_in'):
+        return redirect(url_for('login'))
+
+
+@app.route('/login', methods=['GET'])
+def login():
+    return render_template('login.html')
+
+
+@app.route('/login', methods=['POST'])
+def do_login():
+    if request.form.get('password') == ADMIN_PASSWORD:
+        session['logged_in'] = True
+        return redirect(url_for('dashboard'))
+    return render_template('login.html', error='Invalid password')
+
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('login'))
+
+
+@app.route('/')
+def dashboard():
+    cams = get_camera_list()
+    stats = attendance.get_stats()
+    return render_template('dashboard.html', cameras=cams, stats=stats)
+
+
+def process_frame(frame):
+    """Recognize faces in a camera frame, log attendance and draw overlays.
+
+    Frames the scheduler skips, and frames without motion, are shown with
+    the latest known boxes.
+    """
+    global last_unknown_alert, last_alert_pushed, last_faces
+    if not scheduler.should_process() or not motion.has_motion(frame):
+        return face_utils.draw_overlays(frame, *last_faces)
+    started = time.monotonic()
+    tracks = recognizer.process(frame, gallery.matcher)
+    locations = [t.location for t in tracks]
+    names = [t.name for t in tracks]
+    last_faces = (locations, names)
+    if 'Unknown' in names:
+        last_unknown_alert = time.time()
+        if last_unknown_alert - last_alert_pushed >= ALERT_REPEAT:
+            last_alert_pushed = last_unknown_alert
+            events.publish('unknown_alert', {'time': last_unknown_alert})
+    if attendance.allowed_time():
+        for track in tracks:
+            # Only tracks recognized on this frame carry a new decision.
+            if not track.fresh or not deduper.should_log(track.name, track.encoding):
+                continue
+            if track.name == 'Unknown':
+                folder = attendance.UNKNOWN_DIR
+                status = 'Unknown - Logged'
+            else:
+                folder = attendance.SNAPSHOT_DIR
+                status = 'Present'
+            top, right, bottom, left = track.location
+            writer.submit(track.name, frame[top:bottom, left:right], folder, status)
+    scheduler.record(started)
+    return face_utils.draw_overlays(frame, locations, names)
+
+
+# One capture-and-recognize worker shared by every /video_feed client.
+stream = CameraStream(process_frame, camera_index=0)
+atexit.register(stream.close)
+
+
+@app.route('/video_feed')
+def video_feed():
+    return Response(stream.frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+def reset_camera_state():
+    """Forget tracks and motion history of the previous camera."""
+    global last_faces
+    recognizer.reset()
+    motion.reset()
+    last_faces = ([], [])
+
+
+@app.route('/set_camera', methods=['POST'])
+def set_camera():
+    stream.switch(int(request.form.get('index', 0)), on_stopped=reset_camera_state)
+    return redirect(url_for('dashboard'))
+
+
+@app.route('/add-student', methods=['GET', 'POST'])
+def add_student():
+    if request.method == 'POST':
+        name = request.form.get('name')
+        f = request.files.get('image')
+        if name and f:
+            os.makedirs(attendance.KNOWN_DIR, exist_ok=True)
+            path = attendance.new_photo_path(name, os.path.splitext(f.filename)[1])
+            f.save(path)
+            gallery.add_image(path)
+            return redirect(url_for('dashboard'))
+    return render_template('add_student.html')
+
+
+@app.route('/processed/<filename>')
+def processed_file(filename):
+    return send_from_directory('data/processed', filename)
+
+
+# Only face snapshots are served; the rest of data/ (enrolled photos, the
+# log and the caches) must not be reachable from the dashboard.
+SNAPSHOT_FOLDERS = {
+    'snapshots': attendance.SNAPSHOT_DIR,
+    'unknown': attendance.UNKNOWN_DIR,
+}
+
+
+def snapshot_url(path):
+    """Return the /snapshots URL of a logged snapshot, or None if it is not served."""
+    path = os.path.abspath(path or '')
+    for folder, directory in SNAPSHOT_FOLDERS.items():
+        directory = os.path.abspath(directory)
+        if path.startswith(directory + os.sep):
+            rel = os.path.relpath(path, directory).replace(os.sep, '/')
+            return url_for('snapshot_file', folder=folder, filename=rel)
+    return None
+
+
+@app.route('/snapshots/<folder>/<path:filename>')
+def snapshot_file(folder, filename):
+    if folder not in SNAPSHOT_FOLDERS:
+        abort(404)
+    return send_from_directory(SNAPSHOT_FOLDERS[folder], filename)
+
+
+@app.route('/attendance')
+def attendance_page():
+    # Rows are loaded page by page from /api/attendance, so the page is
+    # rendered empty and refreshes its table instead of reloading.
+    html = attendance.render_dashboard_html([])
+    html = html.replace('<meta http-equiv="refresh" content="10">', '')
+    return render_template_string(html)
+
+
+def query_filters():
+    """Return the ``start``/``end``/``name``/``status`` filters of the request."""
+    return {key: request.args.get(key) or None for key in ('start', 'end', 'name', 'status')}
+
+
+def export_filename(filters, ext):
+    span = '_'.join(v for v in (filters['start'], filters['end']) if v) or 'all'
+    return secure_filename(f"attendance_log_{span}.{ext}")
+
+
+@app.route('/api/attendance')
+def api_attendance():
+    """Query the attendance log.
+
+    Parameters: ``start`` and ``end`` (ISO dates, inclusive), ``name`` (part
+    of a name), ``status``, ``page`` and ``per_page``.
+    """
+    args = request.args
+    try:
+        result = attendance_index.query(
+            page=args.get('page', 1),
+            per_page=args.get('per_page', 50),
+            **query_filters(),
+        )
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    for rec in result['records']:
+        rec['snapshot_url'] = snapshot_url(rec.get('snapshot_path'))
+    return jsonify(result)
+
+
+@app.route('/api/attendance/export.csv')
+def export_csv():
+    """Stream the records matching the query filters as CSV."""
+    filters = query_filters()
+    rows = export.iter_csv(attendance_index.iter_records(**filters))
+    return Response(
+        stream_with_context(rows),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(filters, "csv")}"'},
+    )
+
+
+@app.route('/api/attendance/export.pdf')
+def export_pdf():
+    """Return a PDF report of the records matching the query filters."""
+    filters = query_filters()
+    title = 'Attendance Report'
+    if filters['start'] or filters['end']:
+        title += f" {filters['start'] or '...'} - {filters['end'] or '...'}"
+    # Small reports stay in memory, large ones spill to a temporary file.
+    out = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+    try:
+        export.write_pdf(attendance_index.iter_records(**filters), out, title)
+    except ImportError:
+        out.close()
+        return jsonify({'error': 'PDF export needs the reportlab package'}), 501
+    out.seek(0)
+    return send_file(out, mimetype='application/pdf', as_attachment=True,
+                     download_name=export_filename(filters, 'pdf'))
+
+
+@app.route('/writer_stats')
+def writer_stats():
+    return jsonify(writer.stats())
+
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    return jsonify({
+        'analysis_fps': scheduler.analysis_fps,
+        'analysed': scheduler.processed,
+        'skipped_by_scheduler': scheduler.skipped,
+        'motion_checked': motion.checked,
+        'skipped_without_motion': motion.skipped,
+        'faces_encoded': recognizer.encoded,
+        'faces_tracked': recognizer.reused,
+        'writer': writer.stats(),
+    })
+
+
+@app.route('/events')
+def event_stream():
+    """Server-sent events: ``unknown_alert`` and ``attendance``."""
+    return Response(events.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/unknown_alert')
+def unknown_alert():
+    # Kept for clients that poll; dashboards use /events.
+    alert = time.time() - last_unknown_alert < 5
+    return jsonify({'alert': alert})
+
+
+def main():
+    attendance.ensure_dirs()
+    app.run(host='0.0.0.0', port=8000, debug=False)